@@ -0,0 +1,82 @@
+# -*- coding: utf-8 -*-
+
+"""
+The MIT License (MIT)
+
+Copyright (c) 2024 Nortxort
+
+Permission is hereby granted, free of charge, to any person obtaining a
+copy of this software and associated documentation files (the "Software"),
+to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense,
+and/or sell copies of the Software, and to permit persons to whom the
+Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+DEALINGS IN THE SOFTWARE.
+"""
+
+import asyncio
+import time
+
+from yarl import URL
+
+from web.cookies import IndexedCookieJar
+
+
+SIZES = [10_000, 100_000, 1_000_000]
+COOKIES_PER_DOMAIN = 10
+LOOKUPS = 1000
+
+
+class BenchmarkJar(IndexedCookieJar):
+    # newer aiohttp versions cap the jar size, lift it to fill the jar
+    _limits_enabled = False
+
+
+def linear_lookup(jar, domain: str, name: str):
+    """ The cookie lookup as done before the domain index. """
+    domain_cookies = [cookie for cookie in jar if cookie['domain'] == domain]
+    for cookie in domain_cookies:
+        if cookie.key == name:
+            return cookie
+
+
+def fill(jar, size: int) -> list:
+    domains = [f'host{i}.example.com' for i in range(size // COOKIES_PER_DOMAIN)]
+    for domain in domains:
+        cookies = {f'cookie{n}': 'value' for n in range(COOKIES_PER_DOMAIN)}
+        jar.update_cookies(cookies, URL(f'http://{domain}/'))
+    return domains
+
+
+def measure(func, *args) -> float:
+    start = time.perf_counter()
+    func(*args)
+    return time.perf_counter() - start
+
+
+async def main():
+    for size in SIZES:
+        jar = BenchmarkJar()
+        domains = fill(jar, size)
+        targets = [domains[i * len(domains) // LOOKUPS] for i in range(LOOKUPS)]
+
+        # the linear scan is too slow to run LOOKUPS times on large jars
+        scans = targets[::max(1, size // 1000)]
+        linear = measure(lambda: [linear_lookup(jar, d, 'cookie5') for d in scans]) / len(scans)
+        indexed = measure(lambda: [jar.get(d, 'cookie5') for d in targets]) / LOOKUPS
+        delete = measure(lambda: [jar.delete(d, 'cookie5') for d in targets]) / LOOKUPS
+
+        print(f'{size:>9} cookies  linear lookup {linear * 1e6:12.1f} us  '
+              f'indexed lookup {indexed * 1e6:6.2f} us  indexed delete {delete * 1e6:6.2f} us')
+
+asyncio.run(main())
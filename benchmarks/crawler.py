@@ -0,0 +1,83 @@
+# -*- coding: utf-8 -*-
+
+"""
+The MIT License (MIT)
+
+Copyright (c) 2024 Nortxort
+
+Permission is hereby granted, free of charge, to any person obtaining a
+copy of this software and associated documentation files (the "Software"),
+to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense,
+and/or sell copies of the Software, and to permit persons to whom the
+Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+DEALINGS IN THE SOFTWARE.
+"""
+
+# Crawler throughput by the amount of worker processes, with a CPU heavy
+# handler. The server runs in its own process, so on a machine with N
+# cores throughput should scale close to linearly up to N - 1 workers.
+#
+#   PYTHONPATH=. python benchmarks/crawler.py
+
+import hashlib
+import multiprocessing
+import os
+import time
+
+import server
+from web import Crawler
+
+
+REQUESTS = 4000
+ROUNDS = 300
+
+
+async def parse(response) -> int:
+    """ Stand in for CPU heavy parsing of a response. """
+    digest = await response.read()
+    for _ in range(ROUNDS):
+        digest = hashlib.sha256(digest).digest()
+    return len(digest)
+
+
+def serve() -> None:
+    from aiohttp import web as aioweb
+    aioweb.run_app(server.create_app(), host=server.HOST, port=server.PORT,
+                   print=None, access_log=None)
+
+
+def main():
+    process = multiprocessing.Process(target=serve, daemon=True)
+    process.start()
+    time.sleep(1)
+
+    cores = os.cpu_count() or 1
+    counts = sorted({1, 2, max(1, cores // 2), max(1, cores - 1)})
+    base = None
+
+    for workers in counts:
+        crawler = Crawler(parse, workers=workers, shard='round-robin')
+        urls = (server.url('/bytes') for _ in range(REQUESTS))
+        for _ in crawler.run(urls):
+            pass
+
+        rps = crawler.stats()['total']['rps']
+        base = base or rps
+        print(f'{workers:>3} workers {rps:10.0f} requests/sec  scaling {rps / base / workers:6.1%}')
+
+    process.terminate()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,89 @@
+# -*- coding: utf-8 -*-
+
+"""
+The MIT License (MIT)
+
+Copyright (c) 2024 Nortxort
+
+Permission is hereby granted, free of charge, to any person obtaining a
+copy of this software and associated documentation files (the "Software"),
+to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense,
+and/or sell copies of the Software, and to permit persons to whom the
+Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+DEALINGS IN THE SOFTWARE.
+"""
+
+import asyncio
+import os
+import tempfile
+import time
+
+import aiofile
+
+import server
+from web import download_file, get, Session
+
+
+SIZE = 256 * 1024 * 1024
+RUNS = 3
+
+
+async def fixed_chunk_download(url: str, path: str, chunk_size: int = 4096) -> int:
+    """ The download loop before write coalescing, for comparison. """
+    response = await get(url)
+    size = 0
+    async with aiofile.async_open(path, 'wb') as f:
+        while True:
+            data = await response.content.read(chunk_size)
+            if not data:
+                break
+            await f.write(data)
+            size += len(data)
+    response.release()
+    return size
+
+
+async def measure(func, *args, **kwargs) -> float:
+    """ Best MB/s of RUNS downloads. """
+    best = 0.0
+    for _ in range(RUNS):
+        start = time.perf_counter()
+        await func(*args, **kwargs)
+        best = max(best, SIZE / (time.perf_counter() - start) / 1024 ** 2)
+    return best
+
+
+async def main():
+    with tempfile.TemporaryDirectory() as tmp:
+        source = os.path.join(tmp, 'source.bin')
+        with open(source, 'wb') as f:
+            for _ in range(SIZE // (16 * 1024 * 1024)):
+                f.write(os.urandom(16 * 1024 * 1024))
+
+        runner = await server.start(server.create_app(file_path=source))
+        url = server.url('/file')
+        target = os.path.join(tmp, 'target.bin')
+
+        before = await measure(fixed_chunk_download, url, target)
+        after = await measure(download_file, url, target)
+        segmented = await measure(download_file, url, target, segments=4)
+
+        print(f'fixed 4096 byte chunks  {before:8.1f} MB/s')
+        print(f'download_file           {after:8.1f} MB/s')
+        print(f'download_file 4 ranges  {segmented:8.1f} MB/s')
+
+        await Session.close()
+        await runner.cleanup()
+
+asyncio.run(main())
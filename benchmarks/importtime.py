@@ -0,0 +1,85 @@
+# -*- coding: utf-8 -*-
+
+"""
+The MIT License (MIT)
+
+Copyright (c) 2024 Nortxort
+
+Permission is hereby granted, free of charge, to any person obtaining a
+copy of this software and associated documentation files (the "Software"),
+to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense,
+and/or sell copies of the Software, and to permit persons to whom the
+Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+DEALINGS IN THE SOFTWARE.
+"""
+
+# Import time budget for the package, fails when `import web` gets
+# slower than the budget or pulls in a heavy dependency.
+#
+#   PYTHONPATH=. python benchmarks/importtime.py --budget 50
+
+import argparse
+import subprocess
+import sys
+
+
+# modules that must stay out of `import web` and the lightweight helpers
+HEAVY = ('aiohttp', 'aiofile', 'caio', 'yarl', 'multidict')
+
+CODE = 'import web; web.random_agent(); web.default_headers()'
+
+
+def cumulative_us(module: str = 'web') -> int:
+    """
+    Cumulative import time of a module, as reported by `python -X importtime`.
+
+    :param module: the top level module name.
+    :return: microseconds.
+    """
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+                            capture_output=True, text=True, check=True)
+    for line in result.stderr.splitlines():
+        parts = line.split('|')
+        if len(parts) == 3 and parts[2].strip() == module:
+            return int(parts[1])
+    raise RuntimeError(f'no import time reported for {module}')
+
+
+def loaded_heavy() -> list:
+    """ Heavy modules loaded after importing web and using the lightweight helpers. """
+    check = f'{CODE}; import sys; print(" ".join(m for m in {HEAVY!r} if m in sys.modules))'
+    result = subprocess.run([sys.executable, '-c', check], capture_output=True, text=True, check=True)
+    return result.stdout.split()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Check the import time budget of web.')
+    parser.add_argument('--budget', type=float, default=50.0, help='milliseconds')
+    parser.add_argument('--runs', type=int, default=5)
+    args = parser.parse_args()
+
+    # the best of a few runs, the first one may pay for a cold disk cache
+    ms = min(cumulative_us() for _ in range(args.runs)) / 1000
+    heavy = loaded_heavy()
+    print(f'import web {ms:.1f} ms, budget {args.budget:.1f} ms')
+
+    failed = False
+    if ms > args.budget:
+        print(f'import web exceeds the budget by {ms - args.budget:.1f} ms')
+        failed = True
+    if heavy:
+        print(f'import web loads {", ".join(heavy)}')
+        failed = True
+
+    sys.exit(1 if failed else 0)
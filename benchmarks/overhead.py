@@ -0,0 +1,131 @@
+# -*- coding: utf-8 -*-
+
+"""
+The MIT License (MIT)
+
+Copyright (c) 2024 Nortxort
+
+Permission is hereby granted, free of charge, to any person obtaining a
+copy of this software and associated documentation files (the "Software"),
+to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense,
+and/or sell copies of the Software, and to permit persons to whom the
+Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+DEALINGS IN THE SOFTWARE.
+"""
+
+# Per call overhead of web.request over a raw ClientSession.request.
+#
+# The end to end numbers against the local server are too noisy to gate
+# on a few microseconds, so the gate measures the dispatch overhead with
+# a session answering instantly, leaving only the cost of the wrapper. The
+# budget is relative to a raw request, so it holds on faster and slower machines.
+#
+#   PYTHONPATH=. python benchmarks/overhead.py --budget 3
+
+import argparse
+import asyncio
+import sys
+import time
+
+import server
+import web
+
+
+class InstantSession:
+    """ Stand in for aiohttp.ClientSession answering without any I/O. """
+    closed = False
+
+    class Response:
+        def release(self):
+            pass
+
+    async def request(self, method, url, **kwargs):
+        return self.Response()
+
+
+async def timed(call, count: int) -> float:
+    """ Seconds per call of count sequential calls. """
+    start = time.perf_counter()
+    for _ in range(count):
+        response = await call()
+        response.release()
+    return (time.perf_counter() - start) / count
+
+
+async def compare(wrapped, raw, count: int, rounds: int) -> tuple:
+    """ Best seconds per call of wrapped and raw, in interleaved rounds. """
+    await timed(wrapped, count // 10)
+    await timed(raw, count // 10)
+
+    best_wrapped = best_raw = float('inf')
+    for _ in range(rounds):
+        best_wrapped = min(best_wrapped, await timed(wrapped, count))
+        best_raw = min(best_raw, await timed(raw, count))
+    return best_wrapped, best_raw
+
+
+def report(name: str, wrapped: float, raw: float) -> float:
+    overhead = (wrapped - raw) * 1e6
+    print(f'{name:<10} aiohttp {raw * 1e6:8.2f} us  web {wrapped * 1e6:8.2f} us  '
+          f'overhead {overhead:6.2f} us')
+    return overhead
+
+
+async def main(args) -> float:
+    """ Dispatch overhead in percent of a raw request. """
+    # the same headers web sends, so only the wrapper differs
+    headers = web.default_headers()
+
+    runner = await server.start(server.create_app())
+    url = server.url('/')
+    client = web.Session.client()
+
+    async def wrapped():
+        return await web.get(url)
+
+    async def raw():
+        return await client.request('GET', url, headers=headers)
+
+    best, network = await compare(wrapped, raw, args.requests, args.rounds)
+    report('network', best, network)
+    await web.Session.close()
+    await runner.cleanup()
+
+    session = web.Session()
+    session.session = instant = InstantSession()
+
+    async def wrapped():
+        return await web.get(url, session=session)
+
+    async def raw():
+        return await instant.request('GET', url, headers=headers)
+
+    overhead = report('dispatch', *await compare(wrapped, raw, args.requests * 50, args.rounds))
+    percent = overhead / (network * 1e6) * 100
+    print(f'dispatch overhead is {percent:.2f}% of a raw request')
+    return percent
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Measure the per request overhead of web.')
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--rounds', type=int, default=5)
+    parser.add_argument('--budget', type=float, default=3.0,
+                        help='allowed dispatch overhead in percent of a raw request')
+    args = parser.parse_args()
+
+    overhead = asyncio.run(main(args))
+    if overhead > args.budget:
+        print(f'dispatch overhead exceeds the budget of {args.budget:.2f}%')
+        sys.exit(1)
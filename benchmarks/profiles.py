@@ -0,0 +1,73 @@
+# -*- coding: utf-8 -*-
+
+"""
+The MIT License (MIT)
+
+Copyright (c) 2024 Nortxort
+
+Permission is hereby granted, free of charge, to any person obtaining a
+copy of this software and associated documentation files (the "Software"),
+to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense,
+and/or sell copies of the Software, and to permit persons to whom the
+Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+DEALINGS IN THE SOFTWARE.
+"""
+
+import asyncio
+import time
+
+import server
+from web import get, Session
+from web.session import PROFILES
+
+
+REQUESTS = 5000
+CONCURRENCY = 64
+
+
+async def run_profile(profile: str) -> float:
+    """
+    Measure requests/sec for a connector profile.
+
+    :param profile: name of the connector profile.
+    :return: requests per second.
+    """
+    session = Session(profile=profile)
+    queue = asyncio.Queue()
+    for _ in range(REQUESTS):
+        queue.put_nowait(server.url('/bytes'))
+
+    async def worker():
+        while not queue.empty():
+            response = await get(queue.get_nowait(), session=session)
+            await response.read()
+
+    start = time.perf_counter()
+    await asyncio.gather(*[worker() for _ in range(CONCURRENCY)])
+    elapsed = time.perf_counter() - start
+
+    await session.reset()
+    return REQUESTS / elapsed
+
+
+async def main():
+    runner = await server.start(server.create_app())
+
+    for profile in [None] + list(PROFILES):
+        rps = await run_profile(profile)
+        print(f'{profile or "default":<10} {rps:10.0f} requests/sec')
+
+    await runner.cleanup()
+
+asyncio.run(main())
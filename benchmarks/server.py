@@ -0,0 +1,94 @@
+# -*- coding: utf-8 -*-
+
+"""
+The MIT License (MIT)
+
+Copyright (c) 2024 Nortxort
+
+Permission is hereby granted, free of charge, to any person obtaining a
+copy of this software and associated documentation files (the "Software"),
+to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense,
+and/or sell copies of the Software, and to permit persons to whom the
+Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+DEALINGS IN THE SOFTWARE.
+"""
+
+import asyncio
+import os
+
+from aiohttp import web as aioweb
+
+
+HOST = '127.0.0.1'
+PORT = 8765
+
+
+def url(path: str = '/') -> str:
+    """ Url of a path on the local benchmark server. """
+    return f'http://{HOST}:{PORT}{path}'
+
+
+def create_app(payload_size: int = 1024, file_path: str = None) -> aioweb.Application:
+    """
+    Create the local benchmark server application.
+
+    :param payload_size: size of the body for the /bytes route.
+    :param file_path: file served by the /file route, supports ranges.
+    :return: aiohttp.web.Application
+    """
+    payload = os.urandom(payload_size)
+
+    async def empty(request):
+        return aioweb.Response(text='ok')
+
+    async def data(request):
+        return aioweb.Response(body=payload)
+
+    async def echo(request):
+        return aioweb.Response(body=await request.read())
+
+    async def file(request):
+        return aioweb.FileResponse(file_path)
+
+    async def ws(request):
+        sock = aioweb.WebSocketResponse()
+        await sock.prepare(request)
+        async for msg in sock:
+            await sock.send_str(msg.data)
+        return sock
+
+    app = aioweb.Application(client_max_size=1024 ** 3)
+    app.router.add_get('/', empty)
+    app.router.add_get('/bytes', data)
+    app.router.add_route('*', '/echo', echo)
+    app.router.add_get('/ws', ws)
+    if file_path is not None:
+        app.router.add_get('/file', file)
+
+    return app
+
+
+async def start(app: aioweb.Application) -> aioweb.AppRunner:
+    """
+    Start serving a application on HOST:PORT.
+
+    :param app: aiohttp.web.Application
+    :return: aiohttp.web.AppRunner, call cleanup() to stop the server.
+    """
+    runner = aioweb.AppRunner(app, access_log=None)
+    await runner.setup()
+    await aioweb.TCPSite(runner, HOST, PORT).start()
+    # give the server a moment to start listening
+    await asyncio.sleep(0.1)
+    return runner
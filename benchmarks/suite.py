@@ -0,0 +1,262 @@
+# -*- coding: utf-8 -*-
+
+"""
+The MIT License (MIT)
+
+Copyright (c) 2024 Nortxort
+
+Permission is hereby granted, free of charge, to any person obtaining a
+copy of this software and associated documentation files (the "Software"),
+to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense,
+and/or sell copies of the Software, and to permit persons to whom the
+Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+DEALINGS IN THE SOFTWARE.
+"""
+
+# Benchmark every public entry point against raw aiohttp on a local server.
+#
+#   PYTHONPATH=. python benchmarks/suite.py --output results.json
+#   PYTHONPATH=. python benchmarks/suite.py --baseline results.json
+#
+# Results are written as JSON, against a baseline from a previous run
+# the run fails if the web / aiohttp ratio of a benchmark dropped more
+# than the tolerance.
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+
+import aiohttp
+
+import server
+import web
+
+
+VERBS = ('get', 'post', 'put', 'patch', 'delete')
+
+
+def percentile(values: list, p: float) -> float:
+    """ Percentile of sorted values. """
+    if not values:
+        return 0.0
+    return values[min(len(values) - 1, int(len(values) * p / 100))]
+
+
+def summary(latencies: list, elapsed: float) -> dict:
+    latencies.sort()
+    return {
+        'requests': len(latencies),
+        'rps': len(latencies) / elapsed,
+        'p50_ms': percentile(latencies, 50) * 1000,
+        'p99_ms': percentile(latencies, 99) * 1000
+    }
+
+
+async def run_requests(call, count: int, concurrency: int) -> dict:
+    """
+    Run count requests with concurrency workers.
+
+    :param call: coroutine function doing and reading a single request.
+    :return: rps, p50 and p99 latency.
+    """
+    latencies = []
+    remaining = count
+
+    async def worker():
+        nonlocal remaining
+        while remaining > 0:
+            remaining -= 1
+            start = time.perf_counter()
+            await call()
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*[worker() for _ in range(concurrency)])
+    return summary(latencies, time.perf_counter() - start)
+
+
+async def bench_verbs(args) -> dict:
+    url = server.url('/echo')
+    body = os.urandom(args.body_size)
+    results = {}
+
+    async with aiohttp.ClientSession() as client:
+        for verb in VERBS:
+            kwargs = {} if verb in ('get', 'delete') else {'data': body}
+            func = getattr(web, verb)
+
+            async def wrapped():
+                response = await func(url, **kwargs)
+                await response.read()
+
+            async def raw():
+                async with client.request(verb.upper(), url, **kwargs) as response:
+                    await response.read()
+
+            # warm up the connection pools
+            await run_requests(wrapped, args.concurrency, args.concurrency)
+            await run_requests(raw, args.concurrency, args.concurrency)
+
+            results[verb] = {
+                'web': await run_requests(wrapped, args.requests, args.concurrency),
+                'aiohttp': await run_requests(raw, args.requests, args.concurrency)
+            }
+
+    return results
+
+
+async def bench_download(args, url: str, tmp: str) -> dict:
+    target = os.path.join(tmp, 'target.bin')
+    size = args.download_size * 1024 ** 2
+
+    async def wrapped():
+        await web.download_file(url, target)
+
+    async def raw():
+        async with aiohttp.ClientSession() as client:
+            async with client.get(url) as response:
+                with open(target, 'wb') as f:
+                    async for chunk in response.content.iter_chunked(1024 * 1024):
+                        f.write(chunk)
+
+    results = {}
+    for name, func in (('web', wrapped), ('aiohttp', raw)):
+        best = 0.0
+        for _ in range(args.runs):
+            start = time.perf_counter()
+            await func()
+            best = max(best, size / (time.perf_counter() - start) / 1024 ** 2)
+        results[name] = {'mb_per_sec': best}
+
+    return {'download_file': results}
+
+
+async def ping_pong(ws, count: int, window: int = 100) -> float:
+    """ Messages per second echoed over ws, keeping window messages in flight. """
+    start = time.perf_counter()
+    sent = 0
+    for _ in range(count // window):
+        for _ in range(window):
+            await ws.send_str('x' * 64)
+        for _ in range(window):
+            await ws.receive()
+        sent += window
+    return sent / (time.perf_counter() - start)
+
+
+async def bench_websocket(args) -> dict:
+    url = server.url('/ws')
+
+    ws = await web.websocket(url)
+    wrapped = await ping_pong(ws, args.messages)
+    await ws.close()
+
+    async with aiohttp.ClientSession() as client:
+        async with client.ws_connect(url) as ws:
+            raw = await ping_pong(ws, args.messages)
+
+    return {'websocket': {'web': {'msgs_per_sec': wrapped}, 'aiohttp': {'msgs_per_sec': raw}}}
+
+
+def overhead(results: dict) -> None:
+    """ Add the web / aiohttp ratio of the primary metric of each benchmark. """
+    for result in results.values():
+        for metric in ('rps', 'mb_per_sec', 'msgs_per_sec'):
+            if metric in result['web']:
+                result['ratio'] = result['web'][metric] / result['aiohttp'][metric]
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list:
+    """
+    Compare against a baseline run.
+
+    :return: list of regression descriptions.
+    """
+    regressions = []
+    for name, result in results.items():
+        previous = baseline.get('results', {}).get(name)
+        if previous is None or 'ratio' not in previous:
+            continue
+        change = result['ratio'] / previous['ratio'] - 1
+        print(f'{name:<14} ratio {previous["ratio"]:.3f} -> {result["ratio"]:.3f} ({change:+.1%})')
+        if change < -tolerance:
+            regressions.append(f'{name} regressed {change:.1%}')
+    return regressions
+
+
+async def main(args) -> dict:
+    with tempfile.TemporaryDirectory() as tmp:
+        source = os.path.join(tmp, 'source.bin')
+        with open(source, 'wb') as f:
+            for _ in range(args.download_size):
+                f.write(os.urandom(1024 ** 2))
+
+        runner = await server.start(server.create_app(file_path=source))
+
+        results = {}
+        results.update(await bench_verbs(args))
+        results.update(await bench_download(args, server.url('/file'), tmp))
+        results.update(await bench_websocket(args))
+
+        await web.Session.close()
+        await runner.cleanup()
+
+    overhead(results)
+    return {
+        'meta': {
+            'time': time.time(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'aiohttp': aiohttp.__version__,
+            'web': web.__version__,
+            'args': vars(args)
+        },
+        'results': results
+    }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark web against raw aiohttp.')
+    parser.add_argument('--requests', type=int, default=5000)
+    parser.add_argument('--concurrency', type=int, default=32)
+    parser.add_argument('--body-size', type=int, default=1024)
+    parser.add_argument('--download-size', type=int, default=128, help='MB')
+    parser.add_argument('--runs', type=int, default=3)
+    parser.add_argument('--messages', type=int, default=20000)
+    parser.add_argument('--output', help='write the results to this JSON file')
+    parser.add_argument('--baseline', help='JSON results of a previous run to compare against')
+    parser.add_argument('--tolerance', type=float, default=0.10,
+                        help='allowed drop of the web / aiohttp ratio against the baseline')
+    args = parser.parse_args()
+
+    report = asyncio.run(main(args))
+
+    for name, result in report['results'].items():
+        print(f'{name:<14} web {result["web"]} aiohttp {result["aiohttp"]} ratio {result["ratio"]:.3f}')
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            problems = compare(report['results'], json.load(f), args.tolerance)
+        if problems:
+            print('\n'.join(problems))
+            sys.exit(1)
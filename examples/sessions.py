@@ -0,0 +1,53 @@
+# -*- coding: utf-8 -*-
+
+"""
+The MIT License (MIT)
+
+Copyright (c) 2024 Nortxort
+
+Permission is hereby granted, free of charge, to any person obtaining a
+copy of this software and associated documentation files (the "Software"),
+to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense,
+and/or sell copies of the Software, and to permit persons to whom the
+Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+DEALINGS IN THE SOFTWARE.
+"""
+
+from web import get, Session
+
+
+async def use_named_sessions():
+    """
+    Test independent sessions of the web package.
+    """
+    # requests without a session argument use the default session
+    await get('https://httpbin.org/cookies/set/default/1')
+
+    # a named session has its own cookie jar and connector
+    await get('https://httpbin.org/cookies/set/crawl/1', session='crawl')
+
+    # sessions can also be created and passed as an instance
+    api = Session('api')
+    await get('https://httpbin.org/cookies/set/api/1', session=api)
+
+    print(Session.cookies('httpbin.org'))
+    print(Session.named('crawl').cookies('httpbin.org'))
+    print(api.cookies('httpbin.org'))
+
+    # close the sessions
+    await Session.close()
+    await Session.named('crawl').close()
+    await api.close()
+
+asyncio.run(use_named_sessions())
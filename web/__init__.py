@@ -24,10 +24,65 @@ FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
 DEALINGS IN THE SOFTWARE.
 """
 
-from .agent import DEFAULT_AGENT, COMMON_AGENTS, random_agent
-from .session import Session
-from .http import request, get, post, websocket, \
-     download_file, default_headers, put, patch, delete
+import importlib
+
+from .agent import DEFAULT_AGENT, COMMON_AGENTS, random_agent, default_headers, \
+     header_profile, Rotation, RoundRobin, Weighted, Sticky
+
+# everything needing aiohttp is imported on first attribute access
+_LAZY = {
+    'Session': 'session',
+    'ResponseCache': 'cache',
+    'BufferedResponse': 'response',
+    'RetryPolicy': 'retry',
+    'CircuitBreaker': 'retry',
+    'RateLimiter': 'ratelimit',
+    'TokenBucket': 'ratelimit',
+    'request': 'http',
+    'get': 'http',
+    'post': 'http',
+    'websocket': 'http',
+    'download_file': 'http',
+    'put': 'http',
+    'patch': 'http',
+    'delete': 'http',
+    'fetch_many': 'http',
+    'DownloadResult': 'http',
+    'last_error': 'http',
+    'RequestError': 'http',
+    'iter_lines': 'stream',
+    'iter_ndjson': 'stream',
+    'iter_sse': 'stream',
+    'ServerSentEvent': 'stream',
+    'stream_lines': 'stream',
+    'stream_ndjson': 'stream',
+    'stream_events': 'stream',
+    'upload': 'uploads',
+    'file_sender': 'uploads',
+    'multipart': 'uploads',
+    'WebSocketClient': 'wsclient',
+    'WebSocketPool': 'wspool',
+    'Timings': 'timing',
+    'RequestTiming': 'timing',
+    'Exporter': 'timing',
+    'LogExporter': 'timing',
+    'Crawler': 'crawler'
+}
+
+
+def __getattr__(name: str):
+    module = _LAZY.get(name)
+    if module is None:
+        raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
+
+    value = getattr(importlib.import_module(f'.{module}', __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_LAZY))
+
 
 __version__ = '2.3.0'  # 2.3.0 25/12/2024
 
@@ -36,7 +91,18 @@ __all__ = [
     'DEFAULT_AGENT',
     'COMMON_AGENTS',
     'random_agent',
+    'header_profile',
+    'Rotation',
+    'RoundRobin',
+    'Weighted',
+    'Sticky',
     'Session',
+    'ResponseCache',
+    'BufferedResponse',
+    'RetryPolicy',
+    'CircuitBreaker',
+    'RateLimiter',
+    'TokenBucket',
     'request',
     'get',
     'post',
@@ -45,5 +111,26 @@ __all__ = [
     'default_headers',
     'put',
     'patch',
-    'delete'
+    'delete',
+    'fetch_many',
+    'DownloadResult',
+    'last_error',
+    'RequestError',
+    'iter_lines',
+    'iter_ndjson',
+    'iter_sse',
+    'ServerSentEvent',
+    'stream_lines',
+    'stream_ndjson',
+    'stream_events',
+    'upload',
+    'file_sender',
+    'multipart',
+    'WebSocketClient',
+    'WebSocketPool',
+    'Timings',
+    'RequestTiming',
+    'Exporter',
+    'LogExporter',
+    'Crawler'
 ]
@@ -24,7 +24,11 @@ FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
 DEALINGS IN THE SOFTWARE.
 """
 
+import itertools
 import random
+import sys
+from collections import OrderedDict
+from types import MappingProxyType
 
 
 DEFAULT_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64; rv:129.0) Gecko/20100101 Firefox/129.0'
@@ -60,3 +64,234 @@ def random_agent() -> str:
     :return: A random user agent
     """
     return random.choice(COMMON_AGENTS)
+
+
+def accept_encoding() -> str:
+    """
+    The content codings aiohttp can decode, br and zstd when a decoder is installed.
+
+    The decoder modules aiohttp uses are looked up, not imported, so
+    neither they nor aiohttp are loaded for this.
+
+    :return: Accept-Encoding header value.
+    """
+    global _accept_encoding
+    if _accept_encoding is None:
+        codings = ['gzip', 'deflate']
+        if _installed('brotlicffi') or _installed('brotli'):
+            codings.append('br')
+        if _installed('compression.zstd' if sys.version_info >= (3, 14) else 'backports.zstd'):
+            codings.append('zstd')
+        _accept_encoding = ', '.join(codings)
+
+    return _accept_encoding
+
+
+def _installed(name: str) -> bool:
+    """ True if module name can be imported, without importing it. """
+    from importlib.util import find_spec
+    try:
+        return find_spec(name) is not None
+    except (ImportError, ValueError):
+        return False
+
+
+_accept_encoding = None
+
+
+def _template(user_agent: str) -> MappingProxyType:
+    """ Immutable base header for a user agent, built once per agent. """
+    template = _templates.get(user_agent)
+    if template is None:
+        template = MappingProxyType({
+            'Accept': '*/*',
+            'Accept-Encoding': accept_encoding(),
+            'User-Agent': user_agent
+        })
+        _templates[user_agent] = template
+    return template
+
+
+_templates = {}
+
+
+def _client_hints(user_agent: str) -> dict:
+    """ The low entropy client hints chromium based browsers send. """
+    version = user_agent.split('Chrome/', 1)[1].split('.', 1)[0]
+    brand = 'Microsoft Edge' if ' Edg/' in user_agent else 'Google Chrome'
+
+    if 'Windows' in user_agent:
+        platform = 'Windows'
+    elif 'Macintosh' in user_agent:
+        platform = 'macOS'
+    else:
+        platform = 'Linux'
+
+    return {
+        'sec-ch-ua': f'"Chromium";v="{version}", "{brand}";v="{version}", "Not-A.Brand";v="99"',
+        'sec-ch-ua-mobile': '?0',
+        'sec-ch-ua-platform': f'"{platform}"'
+    }
+
+
+def header_profile(user_agent: str) -> MappingProxyType:
+    """
+    Immutable header matching the browser of a user agent, built once per agent.
+
+    :param user_agent: the user agent string.
+    :return: read only header mapping.
+    """
+    profile = _profiles.get(user_agent)
+    if profile is None:
+        headers = dict(_template(user_agent))
+
+        if 'Firefox/' in user_agent:
+            headers['Accept-Language'] = 'en-US,en;q=0.5'
+        elif 'Chrome/' in user_agent:
+            headers['Accept-Language'] = 'en-US,en;q=0.9'
+            headers.update(_client_hints(user_agent))
+        else:
+            headers['Accept-Language'] = 'en-US,en;q=0.9'
+
+        profile = MappingProxyType(headers)
+        _profiles[user_agent] = profile
+    return profile
+
+
+_profiles = {}
+
+
+class Rotation:
+    """
+    Base class of user agent rotation strategies.
+
+    Subclasses implement choose, the header profiles of the chosen
+    agents are built once and shared.
+    """
+    def __init__(self, agents: list = None):
+        """
+        :param agents: user agent strings, defaults to COMMON_AGENTS.
+        """
+        self.agents = list(agents or COMMON_AGENTS)
+
+    def choose(self, host: str = None) -> str:
+        raise NotImplementedError
+
+    def headers(self, host: str = None) -> MappingProxyType:
+        """
+        Header profile for a request.
+
+        :param host: host name of the request.
+        :return: read only header mapping.
+        """
+        return header_profile(self.choose(host))
+
+
+class RoundRobin(Rotation):
+    """
+    Use the agents in turn.
+    """
+    def __init__(self, agents: list = None):
+        super().__init__(agents)
+        self._next = itertools.cycle(self.agents).__next__
+
+    def choose(self, host: str = None) -> str:
+        return self._next()
+
+
+class Weighted(Rotation):
+    """
+    Pick a random agent for every request, optionally weighted.
+    """
+    def __init__(self, agents: list = None, weights: list = None):
+        """
+        :param agents: user agent strings, defaults to COMMON_AGENTS.
+        :param weights: relative weight of each agent, equal by default.
+        """
+        super().__init__(agents)
+        if weights is not None and len(weights) != len(self.agents):
+            raise ValueError('weights must match the agents')
+        self.cum_weights = list(itertools.accumulate(weights)) if weights else None
+
+    def choose(self, host: str = None) -> str:
+        if self.cum_weights is None:
+            return random.choice(self.agents)
+        return random.choices(self.agents, cum_weights=self.cum_weights)[0]
+
+
+class Sticky(Weighted):
+    """
+    Keep the agent picked for a host, or for everything.
+
+    A host sees one consistent client, so connections are not reset
+    by bot defences comparing fingerprints. Use one instance per
+    Session with per_host=False to stick per session.
+    """
+    def __init__(self, agents: list = None, weights: list = None,
+                 per_host: bool = True, max_hosts: int = 10000):
+        """
+        :param agents: user agent strings, defaults to COMMON_AGENTS.
+        :param weights: relative weight of each agent, equal by default.
+        :param per_host: pick an agent per host, else one for all requests.
+        :param max_hosts: amount of hosts to remember, the oldest are forgotten.
+        """
+        super().__init__(agents, weights)
+        self.per_host = per_host
+        self.max_hosts = max_hosts
+        self._chosen = OrderedDict()
+
+    def choose(self, host: str = None) -> str:
+        key = host if self.per_host else None
+        agent = self._chosen.get(key)
+        if agent is None:
+            agent = self._chosen[key] = super().choose(host)
+            if len(self._chosen) > self.max_hosts:
+                self._chosen.popitem(last=False)
+        return agent
+
+
+# the rotation used for rua=True
+ROTATION = Sticky()
+
+
+def _rotated(rua, url) -> MappingProxyType:
+    # imported here to keep `import web` light
+    from urllib.parse import urlsplit
+
+    rotation = ROTATION if rua is True else rua
+    host = urlsplit(str(url)).hostname if url is not None else None
+    return rotation.headers(host)
+
+
+def header_template(headers: dict = None, rua=False, url=None):
+    """
+    Like default_headers, but the base header is a shared read only
+    mapping, for callers that do not modify it.
+
+    :param headers: user provided header.
+    :param rua: True or a Rotation, see default_headers.
+    :param url: url of the request.
+    :return: header mapping.
+    """
+    if isinstance(headers, (dict, MappingProxyType)):
+        return headers
+    if rua:
+        return _rotated(rua, url)
+    return _template(DEFAULT_AGENT)
+
+
+def default_headers(headers: dict = None, rua=False, url=None) -> dict:
+    """
+    Construct a basic header.
+
+    :param headers: user provided header.
+    :param rua: use a rotating user agent, True for ROTATION, which keeps a
+    random agent per host, or a Rotation object.
+    :param url: url of the request, for per host rotations.
+    :return: header dictionary.
+    """
+    if isinstance(headers, dict):
+        return headers
+    if rua:
+        return dict(_rotated(rua, url))
+    return dict(_template(DEFAULT_AGENT))
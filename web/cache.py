@@ -0,0 +1,392 @@
+# -*- coding: utf-8 -*-
+
+"""
+The MIT License (MIT)
+
+Copyright (c) 2024 Nortxort
+
+Permission is hereby granted, free of charge, to any person obtaining a
+copy of this software and associated documentation files (the "Software"),
+to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense,
+and/or sell copies of the Software, and to permit persons to whom the
+Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+DEALINGS IN THE SOFTWARE.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import time
+from collections import OrderedDict
+from email.utils import parsedate_to_datetime
+
+from multidict import CIMultiDict
+from yarl import URL
+
+from .response import BufferedResponse
+
+
+log = logging.getLogger(__name__)
+
+# status codes cacheable by default, RFC 7231 section 6.1
+CACHEABLE_STATUS = frozenset([200, 203, 204, 300, 301, 308, 404, 405, 410, 414, 501])
+
+
+def _http_date(value: str):
+    """ Parse a HTTP date to a timestamp, None if invalid. """
+    if value is None:
+        return None
+    try:
+        return parsedate_to_datetime(value).timestamp()
+    except (TypeError, ValueError, IndexError, OverflowError):
+        return None
+
+
+def _credentials(value: str):
+    """ Digest of a Authorization header, the credentials are not stored. """
+    if value is None:
+        return None
+    return hashlib.sha256(value.encode()).hexdigest()
+
+
+def cache_control(value: str) -> dict:
+    """
+    Parse a Cache-Control header.
+
+    :param value: the header value.
+    :return: dictionary of directives, valueless directives map to None.
+    """
+    directives = {}
+    for part in (value or '').split(','):
+        name, _, arg = part.strip().partition('=')
+        if name:
+            directives[name.lower()] = arg.strip('"') if arg else None
+    return directives
+
+
+class CacheEntry:
+    """
+    A stored response.
+    """
+    __slots__ = ('method', 'url', 'status', 'reason', 'headers',
+                 'body', 'stored', 'lifetime', 'vary')
+
+    def __init__(self, method: str, url: str, status: int, reason: str,
+                 headers: list, body: bytes, stored: float, lifetime: float, vary: dict):
+        self.method = method
+        self.url = url
+        self.status = status
+        self.reason = reason
+        self.headers = headers
+        self.body = body
+        self.stored = stored
+        self.lifetime = lifetime
+        self.vary = vary
+
+    @property
+    def size(self) -> int:
+        return len(self.body)
+
+    @property
+    def fresh(self) -> bool:
+        return time.time() - self.stored < self.lifetime
+
+    def header(self, name: str):
+        name = name.lower()
+        for key, value in self.headers:
+            if key.lower() == name:
+                return value
+
+    def response(self) -> BufferedResponse:
+        return BufferedResponse(self.method, self.url, self.status,
+                                self.reason, self.headers, self.body)
+
+    def dumps(self) -> bytes:
+        meta = {name: getattr(self, name) for name in self.__slots__ if name != 'body'}
+        return json.dumps(meta).encode() + b'\n' + self.body
+
+    @classmethod
+    def loads(cls, data: bytes):
+        meta, _, body = data.partition(b'\n')
+        meta = json.loads(meta)
+        meta['headers'] = [tuple(h) for h in meta['headers']]
+        return cls(body=body, **meta)
+
+
+class ResponseCache:
+    """
+    HTTP response cache following RFC 7234 for a private cache.
+
+    Entries are kept in a in memory LRU bounded by the size of the
+    bodies, and optionally written through to a directory on disk.
+    Stale entries carrying a ETag or Last-Modified validator are
+    revalidated with a conditional request.
+    """
+    def __init__(self, max_bytes: int = 64 * 1024 * 1024, path: str = None):
+        """
+        Initialize the cache.
+
+        :param max_bytes: maximum size of the bodies kept in memory.
+        :param path: optional directory for the on disk tier.
+        """
+        self.max_bytes = max_bytes
+        self.path = path
+        self.size = 0
+        self.stats = {
+            'hits': 0,
+            'misses': 0,
+            'revalidations': 0,
+            'stores': 0,
+            'evictions': 0
+        }
+        self._entries = OrderedDict()
+
+        if path is not None:
+            os.makedirs(path, exist_ok=True)
+
+    def __len__(self):
+        return len(self._entries)
+
+    @staticmethod
+    def key(method: str, url, params=None, scope=None) -> str:
+        """
+        The key of a request.
+
+        :param method: request method.
+        :param url: url for the request.
+        :param params: query parameters sent with the request, as aiohttp adds them.
+        :param scope: session the response belongs to, responses fetched with
+        the cookies of one session are not served to another.
+        :return: the key.
+        """
+        if params:
+            url = URL(str(url)).extend_query(params)
+        key = f'{method.upper()} {url}'
+        return key if scope is None else f'{scope} {key}'
+
+    def _file(self, key: str) -> str:
+        return os.path.join(self.path, hashlib.sha256(key.encode()).hexdigest())
+
+    def _remember(self, key: str, entry: CacheEntry) -> None:
+        old = self._entries.pop(key, None)
+        if old is not None:
+            self.size -= old.size
+
+        if entry.size > self.max_bytes:
+            return
+
+        self._entries[key] = entry
+        self.size += entry.size
+
+        while self.size > self.max_bytes:
+            _, evicted = self._entries.popitem(last=False)
+            self.size -= evicted.size
+            self.stats['evictions'] += 1
+
+    def get(self, key: str, headers: dict = None):
+        """
+        Look up a entry.
+
+        :param key: the cache key, see ResponseCache.key
+        :param headers: the request headers, matched against Vary.
+        :return: CacheEntry or None.
+        """
+        entry = self._entries.get(key)
+        if entry is not None:
+            self._entries.move_to_end(key)
+
+        elif self.path is not None:
+            try:
+                with open(self._file(key), 'rb') as f:
+                    entry = CacheEntry.loads(f.read())
+                self._remember(key, entry)
+            except FileNotFoundError:
+                pass
+            except (OSError, ValueError, TypeError) as e:
+                log.warning(f'discarding cache entry for `{key}`: {e}')
+                self.delete(key)
+
+        if entry is not None and entry.vary:
+            headers = {k.lower(): v for k, v in (headers or {}).items()}
+            if 'authorization' in entry.vary:
+                headers['authorization'] = _credentials(headers.get('authorization'))
+            if any(headers.get(name) != value for name, value in entry.vary.items()):
+                return None
+
+        return entry
+
+    def put(self, key: str, entry: CacheEntry) -> None:
+        """
+        Store a entry.
+
+        :param key: the cache key, see ResponseCache.key
+        :param entry: CacheEntry
+        """
+        self._remember(key, entry)
+        self.stats['stores'] += 1
+
+        if self.path is not None:
+            tmp = self._file(key) + '.tmp'
+            try:
+                with open(tmp, 'wb') as f:
+                    f.write(entry.dumps())
+                os.replace(tmp, self._file(key))
+            except OSError as e:
+                log.warning(f'failed to write cache entry for `{key}`: {e}')
+
+    def delete(self, key: str) -> None:
+        """
+        Remove a entry.
+
+        :param key: the cache key, see ResponseCache.key
+        """
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self.size -= entry.size
+
+        if self.path is not None and os.path.exists(self._file(key)):
+            os.remove(self._file(key))
+
+    def clear(self) -> None:
+        """ Remove all entries. """
+        for key in list(self._entries):
+            self.delete(key)
+
+        if self.path is not None:
+            for name in os.listdir(self.path):
+                os.remove(os.path.join(self.path, name))
+
+    @staticmethod
+    def lifetime(headers) -> float:
+        """
+        The freshness lifetime of a response, RFC 7234 section 4.2.1
+
+        :param headers: the response headers.
+        :return: lifetime in seconds.
+        """
+        cc = cache_control(headers.get('Cache-Control'))
+        if 'no-cache' in cc:
+            return 0
+        if 'max-age' in cc:
+            try:
+                return max(0, int(cc['max-age']))
+            except (TypeError, ValueError):
+                return 0
+
+        date = _http_date(headers.get('Date')) or time.time()
+        if 'Expires' in headers:
+            expires = _http_date(headers['Expires'])
+            return max(0, expires - date) if expires is not None else 0
+
+        # heuristic freshness, RFC 7234 section 4.2.2
+        last_modified = _http_date(headers.get('Last-Modified'))
+        if last_modified is not None:
+            return max(0, (date - last_modified) / 10)
+
+        return 0
+
+    def storable(self, method: str, status: int, request_headers: dict, headers) -> bool:
+        """
+        Check if a response may be stored, RFC 7234 section 3.
+
+        :param method: request method.
+        :param status: response status.
+        :param request_headers: the request headers.
+        :param headers: the response headers.
+        :return: True if the response can be stored.
+        """
+        if method not in ('GET', 'HEAD') or status not in CACHEABLE_STATUS:
+            return False
+
+        request_headers = CIMultiDict(request_headers or {})
+        request_cc = cache_control(request_headers.get('Cache-Control'))
+        cc = cache_control(headers.get('Cache-Control'))
+        if 'no-store' in request_cc or 'no-store' in cc or headers.get('Vary') == '*':
+            return False
+
+        if 'Authorization' in request_headers and not (
+                'public' in cc or 's-maxage' in cc or 'must-revalidate' in cc):
+            return False
+
+        return (self.lifetime(headers) > 0 or
+                'ETag' in headers or 'Last-Modified' in headers)
+
+    def store(self, key: str, response, body: bytes, request_headers: dict) -> None:
+        """
+        Store a response if allowed.
+
+        :param key: the cache key, see ResponseCache.key
+        :param response: aiohttp.ClientResponse
+        :param body: the response body.
+        :param request_headers: the request headers.
+        """
+        headers = response.headers
+        if not self.storable(response.method, response.status, request_headers, headers):
+            return
+
+        try:
+            age = max(0, int(headers.get('Age', 0)))
+        except ValueError:
+            age = 0
+
+        request_headers = {k.lower(): v for k, v in (request_headers or {}).items()}
+        vary = {name.strip().lower(): request_headers.get(name.strip().lower())
+                for name in headers.get('Vary', '').split(',') if name.strip()}
+        # the key does not hold the credentials, a entry is only served to the same ones
+        vary['authorization'] = _credentials(request_headers.get('authorization'))
+
+        # the body is stored decoded
+        stored_headers = [(k, v) for k, v in headers.items()
+                          if k.lower() not in ('content-encoding', 'content-length', 'transfer-encoding')]
+        stored_headers.append(('Content-Length', str(len(body))))
+
+        self.put(key, CacheEntry(response.method, str(response.url), response.status,
+                                 response.reason, stored_headers, body,
+                                 time.time() - age, self.lifetime(headers), vary))
+
+    def refresh(self, key: str, entry: CacheEntry, headers) -> CacheEntry:
+        """
+        Update a entry from a 304 response, RFC 7234 section 4.3.4
+
+        :param key: the cache key, see ResponseCache.key
+        :param entry: the revalidated CacheEntry.
+        :param headers: the 304 response headers.
+        :return: the updated CacheEntry.
+        """
+        updated = {k.lower() for k in headers}
+        merged = [(k, v) for k, v in entry.headers if k.lower() not in updated]
+        merged += [(k, v) for k, v in headers.items()
+                   if k.lower() not in ('content-encoding', 'content-length', 'transfer-encoding')]
+
+        entry = CacheEntry(entry.method, entry.url, entry.status, entry.reason, merged,
+                           entry.body, time.time(), self.lifetime(CIMultiDict(merged)), entry.vary)
+        self.put(key, entry)
+        return entry
+
+    @staticmethod
+    def conditional_headers(entry: CacheEntry, headers: dict) -> dict:
+        """
+        Add validators of a entry to the request headers.
+
+        :param entry: the stale CacheEntry.
+        :param headers: the request headers.
+        :return: new header dictionary.
+        """
+        headers = dict(headers or {})
+        if entry.header('ETag') is not None:
+            headers['If-None-Match'] = entry.header('ETag')
+        if entry.header('Last-Modified') is not None:
+            headers['If-Modified-Since'] = entry.header('Last-Modified')
+        return headers
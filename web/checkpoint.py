@@ -0,0 +1,174 @@
+# -*- coding: utf-8 -*-
+
+"""
+The MIT License (MIT)
+
+Copyright (c) 2024 Nortxort
+
+Permission is hereby granted, free of charge, to any person obtaining a
+copy of this software and associated documentation files (the "Software"),
+to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense,
+and/or sell copies of the Software, and to permit persons to whom the
+Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+DEALINGS IN THE SOFTWARE.
+"""
+
+import json
+import logging
+import os
+
+
+log = logging.getLogger(__name__)
+
+
+class Checkpoint:
+    """
+    On-disk sidecar recording the completed byte ranges of a download.
+
+    The validators(ETag and Last-Modified) of the resource are
+    stored along with the ranges, so a partial download is only
+    resumed if the remote file has not changed.
+    """
+    suffix = '.part'
+
+    def __init__(self, path: str, url: str, length: int,
+                 etag: str = None, last_modified: str = None, done: list = None):
+        """
+        Initialize the checkpoint.
+
+        :param path: path and file name of the download.
+        :param url: url of the file to download.
+        :param length: the content length of the file.
+        :param etag: the ETag header of the resource.
+        :param last_modified: the Last-Modified header of the resource.
+        :param done: list of completed [start, end] ranges.
+        """
+        self.path = path
+        self.url = url
+        self.length = length
+        self.etag = etag
+        self.last_modified = last_modified
+        self.done = [tuple(r) for r in done or []]
+
+    @property
+    def sidecar(self) -> str:
+        """ Path of the sidecar file. """
+        return self.path + self.suffix
+
+    @property
+    def completed(self) -> int:
+        """ The amount of completed bytes. """
+        return sum(end - start + 1 for start, end in self.done)
+
+    @property
+    def validator(self):
+        """ The validator to use in a If-Range header, or None. """
+        if self.etag is not None and not self.etag.startswith('W/'):
+            return self.etag
+        return self.last_modified
+
+    @classmethod
+    def load(cls, path: str):
+        """
+        Load the checkpoint for a download.
+
+        :param path: path and file name of the download.
+        :return: Checkpoint or None if there is no valid sidecar.
+        """
+        sidecar = path + cls.suffix
+        if not os.path.isfile(sidecar) or not os.path.isfile(path):
+            return None
+
+        try:
+            with open(sidecar, 'r') as f:
+                state = json.load(f)
+            return cls(path, **state)
+
+        except (OSError, ValueError, TypeError) as e:
+            log.warning(f'ignoring checkpoint `{sidecar}`: {e}')
+
+    def save(self) -> None:
+        """ Write the checkpoint to the sidecar file. """
+        state = {
+            'url': self.url,
+            'length': self.length,
+            'etag': self.etag,
+            'last_modified': self.last_modified,
+            'done': self.done
+        }
+        tmp = self.sidecar + '.tmp'
+        with open(tmp, 'w') as f:
+            json.dump(state, f)
+        os.replace(tmp, self.sidecar)
+
+    def remove(self, partial: bool = False) -> None:
+        """
+        Remove the sidecar file.
+
+        :param partial: also remove the partial download.
+        """
+        paths = [self.sidecar, self.path] if partial else [self.sidecar]
+        for path in paths:
+            if os.path.exists(path):
+                os.remove(path)
+
+    def matches(self, length: int, etag: str = None, last_modified: str = None) -> bool:
+        """
+        Check if the checkpoint is still valid for the remote resource.
+
+        :param length: the content length of the resource.
+        :param etag: the ETag header of the resource.
+        :param last_modified: the Last-Modified header of the resource.
+        :return: True if the partial data can be reused.
+        """
+        if self.validator is None:
+            return False
+        return (self.length == length and self.etag == etag and
+                self.last_modified == last_modified)
+
+    def add(self, start: int, end: int) -> None:
+        """
+        Mark a byte range as completed.
+
+        :param start: first byte of the range.
+        :param end: last byte of the range(inclusive).
+        """
+        if end < start:
+            return
+
+        merged = []
+        for s, e in sorted(self.done + [(start, end)]):
+            if merged and s <= merged[-1][1] + 1:
+                merged[-1] = (merged[-1][0], max(merged[-1][1], e))
+            else:
+                merged.append((s, e))
+        self.done = merged
+
+    def missing(self) -> list:
+        """
+        The byte ranges not yet downloaded.
+
+        :return: list of (start, end) tuples.
+        """
+        ranges = []
+        start = 0
+        for s, e in self.done:
+            if s > start:
+                ranges.append((start, s - 1))
+            start = e + 1
+
+        if start < self.length:
+            ranges.append((start, self.length - 1))
+
+        return ranges
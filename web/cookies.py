@@ -0,0 +1,412 @@
+# -*- coding: utf-8 -*-
+
+"""
+The MIT License (MIT)
+
+Copyright (c) 2024 Nortxort
+
+Permission is hereby granted, free of charge, to any person obtaining a
+copy of this software and associated documentation files (the "Software"),
+to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense,
+and/or sell copies of the Software, and to permit persons to whom the
+Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+DEALINGS IN THE SOFTWARE.
+"""
+
+import json
+import logging
+import os
+import time
+from collections import defaultdict
+from email.utils import parsedate_to_datetime
+from http.cookies import Morsel, SimpleCookie
+
+import aiohttp
+from yarl import URL
+
+
+log = logging.getLogger(__name__)
+
+# morsel attributes kept in snapshots
+_ATTRIBUTES = ('domain', 'path', 'secure', 'httponly', 'samesite')
+
+
+class _TrackedCookies(SimpleCookie):
+    """
+    A storage bucket reporting changed cookie names to the storage.
+    """
+    def __init__(self, storage, key):
+        super().__init__()
+        self._storage = storage
+        self._key = key
+
+    def __setitem__(self, name, value):
+        super().__setitem__(name, value)
+        self._storage.changed(self._key, name)
+
+    def __delitem__(self, name):
+        super().__delitem__(name)
+        self._storage.changed(self._key, name)
+
+    def pop(self, name, *default):
+        if name in self:
+            self._storage.changed(self._key, name)
+        return super().pop(name, *default)
+
+
+class _DomainIndex(defaultdict):
+    """
+    The cookie storage of aiohttp.CookieJar, indexed by domain.
+
+    aiohttp stores cookies keyed by (domain, path). Keeping track
+    of the paths per domain as keys are added and removed makes
+    looking up the cookies for a domain independent of the jar size.
+
+    Changed cookies are collected in dirty for incremental snapshots.
+    """
+    def __init__(self, *args):
+        super().__init__(*args)
+        self.domains = {}
+        self.dirty = set()
+        self.tracking = True
+
+    def changed(self, key, name: str) -> None:
+        if self.tracking:
+            self.dirty.add((key, name))
+
+    def _add(self, key) -> None:
+        # older aiohttp versions key the storage by domain only
+        domain = key[0] if isinstance(key, tuple) else key
+        self.domains.setdefault(domain, set()).add(key)
+
+    def _discard(self, key) -> None:
+        domain = key[0] if isinstance(key, tuple) else key
+        keys = self.domains.get(domain)
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self.domains[domain]
+
+    def __missing__(self, key):
+        self._add(key)
+        bucket = _TrackedCookies(self, key)
+        super().__setitem__(key, bucket)
+        return bucket
+
+    def __setitem__(self, key, value):
+        self._add(key)
+        super().__setitem__(key, value)
+
+    def __delitem__(self, key):
+        super().__delitem__(key)
+        self._discard(key)
+
+    def pop(self, key, *default):
+        if key in self:
+            self._discard(key)
+        return super().pop(key, *default)
+
+    def clear(self):
+        for key, bucket in self.items():
+            for name in bucket:
+                self.changed(key, name)
+        super().clear()
+        self.domains.clear()
+
+    def keys_for(self, domain: str) -> list:
+        """ The storage keys for a domain. """
+        return list(self.domains.get(domain, ()))
+
+
+class IndexedCookieJar(aiohttp.CookieJar):
+    """
+    aiohttp.CookieJar with lookup and deletion by domain and name,
+    and incremental snapshots.
+
+    Snapshots are append only JSON lines files, each line holding a
+    changed or deleted cookie. The file is rewritten with only the
+    live cookies once it grows past twice their amount. Loaded
+    cookies are kept pending per domain, and only added to the jar
+    when their domain is first used.
+    """
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self._cookies = _DomainIndex(self._cookies.default_factory, self._cookies)
+        self._pending = {}
+        self._snapshot_path = None
+        self._snapshot_lines = 0
+
+    def __iter__(self):
+        self._apply_all()
+        return super().__iter__()
+
+    def __len__(self):
+        self._apply_all()
+        return super().__len__()
+
+    def update_cookies(self, cookies, response_url=URL()):
+        self._apply_host(response_url.raw_host)
+        super().update_cookies(cookies, response_url)
+
+    def filter_cookies(self, request_url):
+        self._apply_host(URL(request_url).raw_host)
+        return super().filter_cookies(request_url)
+
+    def clear(self, predicate=None):
+        self._apply_all()
+        super().clear(predicate)
+
+    def _expire(self) -> None:
+        if hasattr(self, '_do_expiration'):
+            self._do_expiration()
+
+    def domain_cookies(self, domain: str) -> list:
+        """
+        All cookies for a domain.
+
+        :param domain: the domain, as stored in the cookies `domain` attribute.
+        :return: list of Morsels.
+        """
+        self._apply(domain)
+        self._expire()
+        return [morsel for key in self._cookies.keys_for(domain)
+                for morsel in self._cookies[key].values()]
+
+    def get(self, domain: str, name: str):
+        """
+        A cookie by domain and name.
+
+        :param domain: the domain, as stored in the cookies `domain` attribute.
+        :param name: the cookie name.
+        :return: Morsel or None.
+        """
+        self._apply(domain)
+        self._expire()
+        for key in self._cookies.keys_for(domain):
+            morsel = self._cookies[key].get(name)
+            if morsel is not None:
+                return morsel
+
+    def delete(self, domain: str, name: str) -> int:
+        """
+        Delete a cookie by domain and name.
+
+        :param domain: the domain, as stored in the cookies `domain` attribute.
+        :param name: the cookie name.
+        :return: the amount of deleted cookies.
+        """
+        self._apply(domain)
+        keys = [key for key in self._cookies.keys_for(domain) if name in self._cookies[key]]
+        if not keys:
+            return 0
+
+        if hasattr(self, '_delete_cookies'):
+            self._delete_cookies([key + (name,) for key in keys])
+        else:
+            self.clear(lambda m: m.key == name and m['domain'] == domain)
+
+        log.debug(f'deleted cookie `{name}` for `{domain}`')
+        return len(keys)
+
+    def _apply(self, domain: str) -> None:
+        """ Add the pending snapshot cookies of a domain to the jar. """
+        records = self._pending.pop(domain, None)
+        if not records:
+            return
+
+        now = time.time()
+        self._cookies.tracking = False
+        try:
+            for (_, name), state in records.items():
+                morsel = _load_morsel(name, state, now)
+                if morsel is not None:
+                    url = URL.build(scheme='https', host=domain)
+                    super().update_cookies({name: morsel}, url)
+        finally:
+            self._cookies.tracking = True
+
+    def _apply_host(self, host: str) -> None:
+        """ Apply the pending cookies of a host and its parent domains. """
+        if not self._pending or not host:
+            return
+        labels = host.lower().split('.')
+        for i in range(len(labels)):
+            self._apply('.'.join(labels[i:]))
+
+    def _apply_all(self) -> None:
+        for domain in list(self._pending):
+            self._apply(domain)
+
+    def _records(self, keys) -> list:
+        """ Snapshot lines for storage keys and names. """
+        expirations = getattr(self, '_expirations', {})
+        host_only = getattr(self, '_host_only_cookies', set())
+
+        lines = []
+        for key, name in keys:
+            bucket = self._cookies.get(key)
+            morsel = bucket.get(name) if bucket is not None else None
+            domain, path = key if isinstance(key, tuple) else (key, '')
+            state = None
+            if morsel is not None:
+                state = _dump_morsel(morsel, expirations.get((domain, path, name)),
+                                     (domain, path, name) in host_only)
+            lines.append(_line(domain, path, name, state))
+
+        return lines
+
+    def snapshot(self, path: str) -> tuple:
+        """
+        Prepare a snapshot of the jar.
+
+        Only cookies changed since the last snapshot to path are
+        included, unless the file needs compacting.
+
+        :param path: path of the snapshot file.
+        :return: the lines to write and the file mode, `a` or `w`.
+        """
+        live = sum(len(bucket) for bucket in self._cookies.values())
+        live += sum(len(records) for records in self._pending.values())
+
+        full = (path != self._snapshot_path or not os.path.exists(path) or
+                self._snapshot_lines + len(self._cookies.dirty) > max(1000, 2 * live))
+
+        if full:
+            keys = [(key, name) for key, bucket in self._cookies.items() for name in bucket]
+            lines = self._records(keys)
+            lines += [_line(domain, path, name, state)
+                      for domain, records in self._pending.items()
+                      for (path, name), state in records.items()]
+            self._snapshot_lines = len(lines)
+        else:
+            lines = self._records(self._cookies.dirty)
+            self._snapshot_lines += len(lines)
+
+        self._cookies.dirty.clear()
+        self._snapshot_path = path
+        return lines, 'w' if full else 'a'
+
+    def load_snapshot(self, path: str, records: dict) -> None:
+        """
+        Add parsed snapshot records as pending cookies.
+
+        :param path: path of the snapshot file.
+        :param records: records from read_snapshot
+        """
+        lines = records.pop(None, 0)
+        for domain, cookies in records.items():
+            self._pending.setdefault(domain, {}).update(cookies)
+
+        self._snapshot_path = path
+        self._snapshot_lines = lines
+
+
+def _line(domain: str, path: str, name: str, state) -> str:
+    """ A snapshot line, state None records a deleted cookie. """
+    return json.dumps({'d': domain, 'p': path, 'n': name, 'm': state}) + '\n'
+
+
+def _dump_morsel(morsel, expires_at: float = None, host_only: bool = False) -> dict:
+    """ Snapshot state of a Morsel. """
+    if expires_at is None:
+        if morsel['max-age']:
+            try:
+                expires_at = time.time() + int(morsel['max-age'])
+            except ValueError:
+                pass
+        elif morsel['expires']:
+            try:
+                expires_at = parsedate_to_datetime(morsel['expires']).timestamp()
+            except (TypeError, ValueError, IndexError, OverflowError):
+                pass
+
+    state = {attr: morsel[attr] for attr in _ATTRIBUTES if morsel.get(attr)}
+    state['value'] = morsel.value
+    state['coded_value'] = morsel.coded_value
+    state['expires_at'] = expires_at
+    state['host_only'] = host_only
+    return state
+
+
+def _load_morsel(name: str, state: dict, now: float):
+    """ Morsel from snapshot state, None if expired. """
+    morsel = Morsel()
+    morsel.set(name, state['value'], state['coded_value'])
+    for attr in _ATTRIBUTES:
+        if attr in state:
+            morsel[attr] = state[attr]
+
+    if state.get('host_only'):
+        morsel['domain'] = ''
+
+    if state.get('expires_at') is not None:
+        remaining = int(state['expires_at'] - now)
+        if remaining <= 0:
+            return None
+        morsel['max-age'] = str(remaining)
+
+    return morsel
+
+
+def read_snapshot(path: str) -> dict:
+    """
+    Read and replay a snapshot file.
+
+    This does no jar access and can run in a executor thread.
+
+    :param path: path of the snapshot file.
+    :return: dictionary of domain: {(path, name): state},
+    and the amount of lines under None.
+    """
+    records = {}
+    lines = 0
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            lines += 1
+            try:
+                record = json.loads(line)
+            except ValueError:
+                # a interrupted append
+                continue
+
+            cookies = records.setdefault(record['d'], {})
+            key = (record['p'], record['n'])
+            if record['m'] is None:
+                cookies.pop(key, None)
+            else:
+                cookies[key] = record['m']
+
+    records[None] = lines
+    return records
+
+
+def write_snapshot(path: str, lines: list, mode: str) -> None:
+    """
+    Write snapshot lines.
+
+    A full snapshot is written to a temporary file first, so a
+    interrupted write never loses the previous snapshot.
+
+    :param path: path of the snapshot file.
+    :param lines: lines from IndexedCookieJar.snapshot
+    :param mode: `a` to append or `w` to replace the file.
+    """
+    target = path if mode == 'a' else path + '.tmp'
+    # cookies may contain credentials
+    with open(target, mode, encoding='utf-8',
+              opener=lambda p, flags: os.open(p, flags, 0o600)) as f:
+        f.writelines(lines)
+
+    if mode == 'w':
+        os.replace(target, path)
@@ -0,0 +1,340 @@
+# -*- coding: utf-8 -*-
+
+"""
+The MIT License (MIT)
+
+Copyright (c) 2024 Nortxort
+
+Permission is hereby granted, free of charge, to any person obtaining a
+copy of this software and associated documentation files (the "Software"),
+to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense,
+and/or sell copies of the Software, and to permit persons to whom the
+Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+DEALINGS IN THE SOFTWARE.
+"""
+
+import asyncio
+import logging
+import multiprocessing
+import os
+import queue
+import threading
+import time
+import traceback
+import zlib
+from urllib.parse import urlsplit
+
+
+log = logging.getLogger(__name__)
+
+
+async def read_body(response) -> tuple:
+    """ Default crawler handler, the status and body of a response. """
+    return response.status, await response.read()
+
+
+class _Batcher:
+    """ Collect results and put them on the outbox in batches. """
+    def __init__(self, index: int, outbox, size: int, interval: float):
+        self.index = index
+        self.outbox = outbox
+        self.size = size
+        self.interval = interval
+        self.items = []
+        self.flushed = time.monotonic()
+
+    async def add(self, item) -> None:
+        self.items.append(item)
+        if len(self.items) >= self.size or time.monotonic() - self.flushed >= self.interval:
+            await self.flush()
+
+    async def flush(self) -> None:
+        if self.items:
+            items, self.items = self.items, []
+            # the outbox is bounded, a blocking put must not stall the loop
+            await asyncio.get_running_loop().run_in_executor(
+                None, self.outbox.put, ('results', self.index, items))
+        self.flushed = time.monotonic()
+
+
+async def _inbox_urls(inbox):
+    """ Urls from the inbox until the None sentinel. """
+    loop = asyncio.get_running_loop()
+    while True:
+        batch = await loop.run_in_executor(None, inbox.get)
+        if batch is None:
+            return
+        for url in batch:
+            yield url
+
+
+async def _work(index: int, inbox, outbox, options: dict) -> dict:
+    """ Crawl the urls of one worker with its own Session. """
+    from .http import fetch_many
+    from .session import Session
+
+    session = Session(profile=options['profile'])
+    batcher = _Batcher(index, outbox, options['batch_size'], options['batch_interval'])
+    stats = {'worker': index, 'pid': os.getpid(), 'requests': 0, 'errors': 0}
+    start = time.perf_counter()
+
+    async def flusher():
+        while True:
+            await asyncio.sleep(batcher.interval)
+            if time.monotonic() - batcher.flushed >= batcher.interval:
+                await batcher.flush()
+
+    handler = options['handler']
+
+    async def guarded(response):
+        # a failing handler costs its url, not the whole worker
+        try:
+            return await handler(response)
+        except Exception as e:
+            log.error(f'crawler handler failed for {response.url}: {e!r}')
+            return None
+
+    task = asyncio.ensure_future(flusher())
+    try:
+        async for url, result in fetch_many(_inbox_urls(inbox), options['method'],
+                                            options['concurrency'], options['per_host'],
+                                            handler=guarded, session=session,
+                                            **options['kwargs']):
+            stats['requests'] += 1
+            stats['errors'] += result is None
+            await batcher.add((url, result))
+
+        task.cancel()
+        await batcher.flush()
+
+    finally:
+        task.cancel()
+        await session.reset()
+
+    stats['elapsed'] = time.perf_counter() - start
+    stats['rps'] = stats['requests'] / stats['elapsed'] if stats['elapsed'] else 0.0
+    return stats
+
+
+def _worker(index: int, inbox, outbox, options: dict) -> None:
+    """ Worker process entry point, runs its own event loop. """
+    try:
+        stats = asyncio.run(_work(index, inbox, outbox, options))
+        outbox.put(('stats', index, stats))
+    except BaseException:
+        outbox.put(('error', index, traceback.format_exc()))
+
+
+class Crawler:
+    """
+    Crawl urls with a pool of worker processes.
+
+    Every worker runs its own event loop and Session, so CPU heavy
+    handlers use all cores. Urls are sharded over the workers, by
+    host by default, which keeps the connections and the per_host
+    limit of a host in one process. Results come back through a
+    bounded queue, in batches.
+
+    The handler runs in the workers, it must be a importable module
+    level coroutine function and return a picklable result.
+    """
+    def __init__(self, handler=None, workers: int = None, method: str = 'GET',
+                 concurrency: int = 32, per_host: int = 0, shard: str = 'host',
+                 profile: str = 'crawl', queue_size: int = 64, batch_size: int = 64,
+                 batch_interval: float = 0.1, start_method: str = None, **kwargs):
+        """
+        Initialize the crawler.
+
+        :param handler: coroutine function called with each response in the
+        workers, defaults to read_body.
+        :param workers: amount of worker processes, defaults to the cpu count.
+        :param method: request method.
+        :param concurrency: maximum amount of requests in flight per worker.
+        :param per_host: maximum amount of requests in flight per host and worker.
+        :param shard: `host` to send all urls of a host to one worker, or
+        `round-robin` to spread them evenly, e.g. for a single host.
+        :param profile: connector profile of the worker sessions, see session.PROFILES.
+        :param queue_size: maximum amount of url and result batches queued per channel.
+        :param batch_size: amount of urls or results sent at once.
+        :param batch_interval: maximum seconds a result waits for its batch to fill.
+        :param start_method: multiprocessing start method, the platform default if None.
+        :param kwargs: keywords for the requests.
+        """
+        if shard not in ('host', 'round-robin'):
+            raise ValueError(f'unknown shard strategy: {shard}')
+
+        self.workers = workers or os.cpu_count() or 1
+        self.shard = shard
+        self.queue_size = queue_size
+        self.batch_size = batch_size
+        self.start_method = start_method
+        self.options = {
+            'handler': handler or read_body,
+            'method': method,
+            'concurrency': concurrency,
+            'per_host': per_host,
+            'profile': profile,
+            'batch_size': batch_size,
+            'batch_interval': batch_interval,
+            'kwargs': kwargs
+        }
+        self.worker_stats = {}
+        self.elapsed = 0.0
+
+    def __repr__(self):
+        return f'<Crawler workers={self.workers} shard={self.shard!r}>'
+
+    def _shard(self, url: str, counter: int) -> int:
+        if self.shard == 'host':
+            host = urlsplit(url).hostname or ''
+            return zlib.crc32(host.encode()) % self.workers
+        return counter % self.workers
+
+    def _feed(self, urls, inboxes: list, stop: threading.Event, failed: set) -> None:
+        """ Shard the urls in to the worker inboxes, runs in a thread. """
+        def put(index, item):
+            # a failed worker no longer reads its inbox, its urls are dropped
+            while not stop.is_set() and index not in failed:
+                try:
+                    inboxes[index].put(item, timeout=0.1)
+                    return
+                except queue.Full:
+                    continue
+
+        batches = [[] for _ in inboxes]
+        try:
+            for counter, url in enumerate(urls):
+                if stop.is_set():
+                    return
+                index = self._shard(url, counter)
+                batches[index].append(url)
+                if len(batches[index]) >= self.batch_size:
+                    put(index, batches[index])
+                    batches[index] = []
+
+            for index, batch in enumerate(batches):
+                if batch:
+                    put(index, batch)
+        finally:
+            for index in range(len(inboxes)):
+                put(index, None)
+
+    def run(self, urls):
+        """
+        Crawl urls.
+
+        :param urls: iterable of urls, consumed lazily.
+        :return: iterator of (url, result) tuples, result is None on error.
+        """
+        ctx = multiprocessing.get_context(self.start_method)
+        inboxes = [ctx.Queue(self.queue_size) for _ in range(self.workers)]
+        outbox = ctx.Queue(self.queue_size)
+        stop = threading.Event()
+        failed = set()
+
+        processes = [ctx.Process(target=_worker, args=(index, inboxes[index], outbox, self.options),
+                                 daemon=True)
+                     for index in range(self.workers)]
+        for process in processes:
+            process.start()
+
+        feeder = threading.Thread(target=self._feed, args=(urls, inboxes, stop, failed),
+                                  daemon=True)
+        feeder.start()
+
+        self.worker_stats = {}
+        start = time.perf_counter()
+        running = self.workers
+        done = set()
+        exited = set()
+        try:
+            while running:
+                try:
+                    kind, index, payload = outbox.get(timeout=0.5)
+                except queue.Empty:
+                    # a killed worker never reports, anything it did send was
+                    # flushed before it exited and read by the previous poll
+                    for index in exited - done:
+                        log.error(f'crawler worker {index} died, exit code {processes[index].exitcode}')
+                        failed.add(index)
+                        done.add(index)
+                        running -= 1
+                    exited = {index for index, process in enumerate(processes)
+                              if process.exitcode is not None}
+                    continue
+
+                if kind == 'results':
+                    yield from payload
+                elif kind == 'stats':
+                    self.worker_stats[index] = payload
+                    done.add(index)
+                    running -= 1
+                else:
+                    log.error(f'crawler worker {index} failed: {payload}')
+                    failed.add(index)
+                    done.add(index)
+                    running -= 1
+
+        finally:
+            self.elapsed = time.perf_counter() - start
+            stop.set()
+            feeder.join()
+            for process in processes:
+                process.join(timeout=1 if running else None)
+                if process.is_alive():
+                    process.terminate()
+            for channel in inboxes + [outbox]:
+                if running:
+                    # stopped early, queued batches will never be read
+                    channel.cancel_join_thread()
+                channel.close()
+            log.debug(f'crawler finished in {self.elapsed:.2f}s, stats: {self.stats()}')
+
+    async def crawl(self, urls):
+        """
+        Crawl urls from a event loop, see run.
+
+        :param urls: iterable of urls, consumed lazily.
+        :return: async iterator of (url, result) tuples, result is None on error.
+        """
+        loop = asyncio.get_running_loop()
+        results = self.run(urls)
+        done = object()
+        try:
+            while True:
+                item = await loop.run_in_executor(None, next, results, done)
+                if item is done:
+                    return
+                yield item
+        finally:
+            await loop.run_in_executor(None, results.close)
+
+    def stats(self) -> dict:
+        """
+        Per worker and aggregated stats of the last run.
+
+        :return: dict with workers, the per worker stats, and total.
+        """
+        workers = [self.worker_stats[index] for index in sorted(self.worker_stats)]
+        requests = sum(stats['requests'] for stats in workers)
+        return {
+            'workers': workers,
+            'total': {
+                'workers': len(workers),
+                'requests': requests,
+                'errors': sum(stats['errors'] for stats in workers),
+                'elapsed': self.elapsed,
+                'rps': requests / self.elapsed if self.elapsed else 0.0
+            }
+        }
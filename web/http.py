@@ -24,40 +24,280 @@ FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
 DEALINGS IN THE SOFTWARE.
 """
 
+import asyncio
+import functools
+import hashlib
 import logging
-from collections import OrderedDict
+import os
+from collections import deque, namedtuple
+from contextvars import ContextVar
+from urllib.parse import urlsplit
 
 import aiohttp
-import aiofile
-
-from . import agent
+from yarl import URL
+
+from .agent import default_headers, header_template
+from .cache import ResponseCache
+from .response import BufferedResponse
+from .ratelimit import RateLimiter
+from .retry import RetryPolicy
+from .checkpoint import Checkpoint
 from .session import Session
 
 
 log = logging.getLogger(__name__)
 
+# request headers that distinguish otherwise identical coalesced requests
+COALESCE_HEADERS = frozenset(['accept', 'accept-encoding', 'accept-language',
+                              'authorization', 'cookie', 'range'])
+
+_inflight = {}
+
+RequestError = namedtuple('RequestError', 'method url error message')
+
+# the most recent failed request of the current task/context
+_last_error = ContextVar('last_error', default=None)
+
+
+def last_error():
+    """
+    The most recent request failure in the current context.
+
+    Requests return None on error, this tells why without
+    having to log a traceback for every failure.
+
+    :return: RequestError, method, url, exception class name and message, or None.
+    """
+    return _last_error.get()
+
+
+def _fail(method: str, url, error: str, message: str) -> None:
+    """ Record and log a failed request. """
+    _last_error.set(RequestError(method, str(url), error, message))
+    log.error(f'web error: {method} {url} {error}: {message}')
+
+
+async def _send(session, method: str, url: str, **kwargs):
+    """
+    Send a request with a aiohttp.ClientSession
+
+    :param session: aiohttp.ClientSession
+    :param method: request method.
+    :param url: url for the request.
+    :return: aiohttp.ClientResponse or None on error.
+    """
+    try:
+        if method == 'websocket':
+            return await session.ws_connect(url=url, **kwargs)
+        return await session.request(method=method, url=url, **kwargs)
+
+    except aiohttp.ClientError as e:
+        _fail(method, url, type(e).__name__, str(e))
+        return None
+
+
+def _body_size(kwargs: dict) -> int:
+    """ Size of a request body, 0 if unknown. """
+    data = kwargs.get('data')
+    if isinstance(data, (bytes, bytearray, memoryview)):
+        return len(data)
+    if isinstance(data, str):
+        return len(data.encode())
+    return 0
+
+
+async def _limited(limiter: RateLimiter, send, method: str, url: str, **kwargs):
+    """
+    Send a request within the limits of a RateLimiter.
+
+    :param limiter: RateLimiter
+    :param send: coroutine function sending the request.
+    :param method: request method.
+    :param url: url for the request.
+    :return: aiohttp.ClientResponse or None on error.
+    """
+    host = urlsplit(str(url)).hostname
+    await limiter.acquire(host, _body_size(kwargs))
+
+    response = await send(method, url, **kwargs)
+    if response is not None and method != 'websocket':
+        limiter.consume(host, response.content_length or 0)
+
+    return response
+
+
+def _replayable(kwargs: dict) -> bool:
+    """ Whether the request body can be sent again, streams and writers are consumed. """
+    data = kwargs.get('data')
+    return data is None or isinstance(data, (bytes, bytearray, memoryview, str, dict, list, tuple))
+
+
+async def _retried(policy: RetryPolicy, send, method: str, url: str, **kwargs):
+    """
+    Send a request, retrying according to a RetryPolicy.
+
+    :param policy: RetryPolicy
+    :param send: coroutine function sending the request.
+    :param method: request method.
+    :param url: url for the request.
+    :return: aiohttp.ClientResponse or None on error.
+    """
+    breaker = policy.breaker(urlsplit(str(url)).hostname)
+    if breaker is not None and not breaker.allow():
+        _fail(method, url, 'CircuitOpen', f'circuit open for {urlsplit(str(url)).hostname}')
+        return None
+
+    loop = asyncio.get_running_loop()
+    deadline = None if policy.deadline is None else loop.time() + policy.deadline
+    user_timeout = 'timeout' in kwargs
+
+    attempt = 0
+    try:
+        while True:
+            if deadline is not None and not user_timeout:
+                kwargs['timeout'] = aiohttp.ClientTimeout(total=max(0.001, deadline - loop.time()))
+
+            try:
+                response = await send(method, url, **kwargs)
+            except asyncio.TimeoutError:
+                _fail(method, url, 'TimeoutError', 'request timed out')
+                response = None
+
+            if breaker is not None:
+                if response is None or (method != 'websocket' and response.status >= 500):
+                    breaker.failure()
+                else:
+                    breaker.success()
+
+            attempt += 1
+            if attempt >= policy.attempts or not policy.retryable(method, response):
+                return response
+
+            if not _replayable(kwargs):
+                log.warning(f'not retrying {method} {url}, the request body can not be sent again')
+                return response
+
+            delay = policy.delay(attempt - 1, response)
+            if deadline is not None and loop.time() + delay >= deadline:
+                return response
+            if breaker is not None and not breaker.allow():
+                log.error(f'circuit opened for {urlsplit(str(url)).hostname}')
+                return response
+
+            if response is not None:
+                response.release()
+
+            log.debug(f'retrying {method} {url} in {delay:.2f}s, attempt {attempt + 1}/{policy.attempts}')
+            await asyncio.sleep(delay)
+
+    except BaseException:
+        # a cancelled or crashed trial must not keep the circuit half open
+        if breaker is not None:
+            breaker.release()
+        raise
+
+
+async def _cached(cache: ResponseCache, scope, send, method: str, url: str, **kwargs):
+    """
+    Send a request through a ResponseCache.
 
-def default_headers(headers: dict = None, rua: bool = False) -> dict:
+    :param cache: ResponseCache
+    :param scope: the session scope of the cache keys, see ResponseCache.key
+    :param send: coroutine function sending the request.
+    :param method: request method.
+    :param url: url for the request.
+    :return: aiohttp.ClientResponse, BufferedResponse or None on error.
+    """
+    params = kwargs.get('params')
+    key = cache.key(method, url, params, scope)
+    headers = kwargs['headers']
+    if kwargs.get('auth') is not None:
+        # aiohttp adds the header itself, the cache has to see the credentials
+        headers = {**headers, 'Authorization': kwargs['auth'].encode()}
+    entry = cache.get(key, headers)
+
+    if entry is not None and entry.fresh:
+        cache.stats['hits'] += 1
+        log.debug(f'cache hit: {key}')
+        return entry.response()
+
+    if entry is not None:
+        kwargs['headers'] = cache.conditional_headers(entry, kwargs['headers'])
+
+    response = await send(method, url, **kwargs)
+    if response is None:
+        return None
+
+    if entry is not None and response.status == 304:
+        response.release()
+        cache.stats['revalidations'] += 1
+        log.debug(f'cache revalidated: {key}')
+        return cache.refresh(key, entry, response.headers).response()
+
+    cache.stats['misses'] += 1
+    if cache.storable(method, response.status, headers, response.headers):
+        cache.store(key, response, await response.read(), headers)
+    elif method not in ('GET', 'HEAD'):
+        # unsafe methods invalidate stored responses, RFC 7234 section 4.4
+        cache.delete(cache.key('GET', url, params, scope))
+
+    return response
+
+
+async def _lead(key: tuple, fetch) -> tuple:
     """
-    Construct a basic header.
+    The shared request of _coalesced, runs in its own task.
 
-    :param headers: user provided header.
-    :param rua: use random user agent string.
-    :return: header dictionary.
+    :return: BufferedResponse or None, and the RequestError on failure.
     """
-    if isinstance(headers, (dict, OrderedDict)):
-        return headers
+    try:
+        response = await fetch()
+        if response is not None:
+            try:
+                response, raw = await BufferedResponse.from_response(response), response
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                _fail(key[1], key[2], type(e).__name__, str(e))
+                raw, response = response, None
+            raw.release()
+
+        # the error is recorded in the context of this task, hand it to the callers
+        return response, None if response is not None else last_error()
+
+    finally:
+        del _inflight[key]
 
-    bh = {
-        'Accept': '*/*',
-        'Accept-Encoding': 'gzip, deflate',
-        'User-Agent': agent.DEFAULT_AGENT
-    }
 
-    if rua:
-        bh['User-Agent'] = agent.random_agent()
+def _retrieve(task) -> None:
+    """ Mark the exception of a shared request as seen, every caller may be gone. """
+    if not task.cancelled():
+        task.exception()
 
-    return bh
+
+async def _coalesced(session, key: tuple, fetch):
+    """
+    Share one in flight request between identical concurrent requests.
+
+    The request runs in its own task, a caller being cancelled does
+    not cancel it for the others.
+
+    :param session: aiohttp.ClientSession
+    :param key: tuple identifying the request.
+    :param fetch: coroutine function performing the request.
+    :return: BufferedResponse or None on error.
+    """
+    key = (id(session),) + key
+    task = _inflight.get(key)
+    if task is None:
+        task = _inflight[key] = asyncio.ensure_future(_lead(key, fetch))
+        task.add_done_callback(_retrieve)
+    else:
+        log.debug(f'coalescing {key[1:3]}')
+
+    response, error = await asyncio.shield(task)
+    if response is None:
+        _last_error.set(error)
+        return None
+    return response.copy()
 
 
 async def request(method: str, url: str, **kwargs):
@@ -66,50 +306,475 @@ async def request(method: str, url: str, **kwargs):
 
     :param method: request method.
     :param url: url for the request.
-    :param kwargs: keywords, see
+    :param kwargs: keywords, session to use a Session instance or name
+    instead of the default session, rua to rotate the user agent, True or a
+    Rotation, defaulting to the rotation of the session, cache to use a ResponseCache,
+    coalesce to share one in flight GET/HEAD request between identical
+    concurrent requests, retry to use a RetryPolicy, limiter to use a
+    RateLimiter other than RateLimiter.default, for the rest see
     https://docs.aiohttp.org/en/stable/client_reference.html#aiohttp.ClientSession.request
-    :return: aiohttp.ClientResponse or None on error.
-    :rtype: aiohttp.ClientResponse | None
+    :return: aiohttp.ClientResponse, BufferedResponse for cached or coalesced
+    responses, or None on error, see last_error.
+    :rtype: aiohttp.ClientResponse | BufferedResponse | None
     """
-    error = None
-    response = None
+    owner = Session.resolve(kwargs.pop('session', None))
+    kwargs['headers'] = header_template(kwargs.get('headers'), kwargs.pop('rua', None) or owner.rotation, url)
 
-    header = kwargs.get('headers')
-    kwargs['headers'] = default_headers(header, kwargs.pop('rua', False))
+    session = owner.client()
+    cache = kwargs.pop('cache', None)
+    coalesce = kwargs.pop('coalesce', False)
+    retry = kwargs.pop('retry', None)
+    limiter = kwargs.pop('limiter', None) or RateLimiter.default
 
-    if Session.session is None:
-        session = Session.create()
-    else:
-        session = Session.session
+    if log.isEnabledFor(logging.DEBUG):
+        log.debug(f'{method} {url} {kwargs}')
+
+    if limiter is None and retry is None and cache is None and not coalesce:
+        return await _send(session, method, url, **kwargs)
 
-    log.debug(f'{method} {url} {kwargs}')
+    send = functools.partial(_send, session)
+    if limiter is not None:
+        send = functools.partial(_limited, limiter, send)
+    if retry is not None:
+        send = functools.partial(_retried, retry, send)
+
+    async def fetch():
+        if cache is not None and method != 'websocket':
+            # the default session shares keys with earlier versions of the cache
+            scope = None if owner is Session else owner.name or id(owner)
+            return await _cached(cache, scope, send, method, url, **kwargs)
+        return await send(method, url, **kwargs)
+
+    if coalesce and method in ('GET', 'HEAD') and kwargs.keys() <= {'headers', 'params'}:
+        headers = tuple(sorted((k.lower(), v) for k, v in kwargs['headers'].items()
+                               if k.lower() in COALESCE_HEADERS))
+        # params may be a unhashable list, dict of lists or MultiDict, key on the final url
+        target = str(URL(str(url)).extend_query(kwargs['params'])) if kwargs.get('params') else url
+        return await _coalesced(session, (method, target, headers), fetch)
+
+    return await fetch()
+
+
+def _segment_ranges(ranges: list, segments: int) -> list:
+    """
+    Split byte ranges into roughly equally sized segments.
+
+    :param ranges: list of inclusive (start, end) tuples.
+    :param segments: the number of segments to split in to.
+    :return: list of (start, end) tuples.
+    """
+    total = sum(end - start + 1 for start, end in ranges)
+    step = max(1, -(-total // max(1, segments)))
+
+    parts = []
+    for start, end in ranges:
+        while start <= end:
+            parts.append((start, min(start + step - 1, end)))
+            start += step
+
+    return parts
+
+
+async def _probe(url: str, **kwargs):
+    """
+    Probe a url for byte range support.
+
+    :param url: url of the resource.
+    :return: the response headers if ranges are supported, else None.
+    """
+    response = await request('HEAD', url=url, **kwargs)
+    if response is None:
+        return None
+
+    response.release()
+    accept_ranges = response.headers.get('Accept-Ranges', '').lower()
+    cl = int(response.headers.get('Content-Length', 0))
+
+    if response.status == 200 and accept_ranges == 'bytes' and cl > 0:
+        return response.headers
+
+    return None
+
+
+async def _write_stream(content, f, offset: int = 0, length: int = None, hashers: dict = None,
+                        chunk_size: int = 4096, write_size: int = 1024 * 1024,
+                        queue_size: int = 4, progress=None) -> tuple:
+    """
+    Copy a response body to a file.
+
+    Reads start at chunk_size and double while the reads come back
+    full, up to a quarter of write_size. Reads are collected in a
+    reused buffer and handed to a writer task as write_size blocks
+    through a bounded queue, so network reads and disk writes overlap.
+
+    :param content: aiohttp.StreamReader of the response.
+    :param f: aiofile.AIOFile opened for writing.
+    :param offset: file offset to write at.
+    :param length: maximum amount of bytes to copy, None to read to the end.
+    :param hashers: hashlib objects to feed the written data to.
+    :param chunk_size: initial and minimum read size.
+    :param write_size: size of the blocks written to the file.
+    :param queue_size: maximum amount of blocks waiting to be written.
+    :param progress: callable called with the amount of bytes written after each block.
+    :return: the amount of bytes written and the read error, if any.
+    """
+    hashers = list((hashers or {}).values())
+    queue = asyncio.Queue(queue_size)
+    written = 0
+    failure = None
+
+    async def writer():
+        nonlocal written, failure
+        while True:
+            data = await queue.get()
+            if data is None:
+                return
+            if failure is not None:
+                continue
+            try:
+                await f.write(data, offset=offset + written)
+            except OSError as e:
+                # keep draining so the reader never blocks
+                failure = e
+                continue
+            for hasher in hashers:
+                hasher.update(data)
+            written += len(data)
+            if progress is not None:
+                progress(written)
+
+    task = asyncio.ensure_future(writer())
+    buf = bytearray(write_size)
+    view = memoryview(buf)
+    pos = 0
+    chunk = chunk_size
+    max_chunk = max(chunk_size, write_size // 4)
+    remaining = length
+    error = None
 
     try:
-        if method == 'websocket':
-            response = await session.ws_connect(url=url, **kwargs)
-        else:
-            response = await session.request(method=method, url=url, **kwargs)
+        try:
+            # stop reading once a write failed, the rest of the body is wasted
+            while (remaining is None or remaining > 0) and failure is None:
+                n = chunk if remaining is None else min(chunk, remaining)
+                data = await content.read(n)
+                if not data:
+                    break
 
-    except aiohttp.ClientError as e:
-        error = f'web error: {e}'
+                size = len(data)
+                if remaining is not None:
+                    remaining -= size
+
+                if size == n:
+                    chunk = min(chunk * 2, max_chunk)
+                elif size < chunk // 4:
+                    chunk = max(chunk // 2, chunk_size)
+
+                if pos + size > write_size:
+                    await queue.put(bytes(view[:pos]))
+                    pos = 0
+
+                if size >= write_size:
+                    await queue.put(data)
+                else:
+                    view[pos:pos + size] = data
+                    pos += size
+
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            error = e
+
+        if pos:
+            await queue.put(bytes(view[:pos]))
+        await queue.put(None)
+        await task
+
+    except BaseException:
+        task.cancel()
+        raise
 
     finally:
+        view.release()
+
+    if failure is not None:
+        raise failure
+
+    return written, error
+
+
+async def _download_segment(url: str, f, start: int, end: int, chunk_size: int,
+                            checkpoint: Checkpoint = None, **kwargs) -> tuple:
+    """
+    Download a byte range and write it at its offset.
+
+    :param url: url of the file to download.
+    :param f: aiofile.AIOFile opened for writing.
+    :param start: first byte of the range.
+    :param end: last byte of the range(inclusive).
+    :param chunk_size: chunk size to read from the response.
+    :param checkpoint: Checkpoint to record progress in.
+    :return: response status and the amount of bytes written.
+    """
+    write_size = kwargs.pop('write_size', 1024 * 1024)
+    headers = dict(default_headers(kwargs.pop('headers', None), kwargs.pop('rua', False), url))
+    headers['Range'] = f'bytes={start}-{end}'
+    if checkpoint is not None and checkpoint.validator is not None:
+        headers['If-Range'] = checkpoint.validator
+
+    response = await request('GET', url=url, headers=headers, **kwargs)
+    if response is None:
+        return 0, 0
+
+    if response.status != 206:
+        log.error(f'range {start}-{end} of {url} failed, status: {response.status}')
+        response.release()
+        return response.status, 0
+
+    def progress(written):
+        checkpoint.add(start, start + written - 1)
+
+    written = 0
+    try:
+        written, error = await _write_stream(response.content, f, start, end - start + 1,
+                                             chunk_size=chunk_size, write_size=write_size,
+                                             progress=progress if checkpoint is not None else None)
         if error is not None:
-            log.error(error, exc_info=True)
+            log.error(f'range {start}-{end} of {url} interrupted at {start + written}: {error}')
+
+    finally:
+        response.release()
+        if checkpoint is not None:
+            checkpoint.add(start, start + written - 1)
 
-        return response
+    return response.status, written
 
 
-async def download_file(url: str, path: str,
-                        chunk_size: int = 4096, **kwargs) -> tuple:
+async def _autosave(checkpoint: Checkpoint, interval: float = 1.0) -> None:
+    """ Save a checkpoint as ranges complete, a killed download resumes from the last save. """
+    saved = list(checkpoint.done)
+    while True:
+        await asyncio.sleep(interval)
+        if checkpoint.done != saved:
+            saved = list(checkpoint.done)
+            try:
+                checkpoint.save()
+            except OSError as e:
+                log.warning(f'failed to save checkpoint `{checkpoint.sidecar}`: {e}')
+
+
+async def _download_segmented(url: str, path: str, cl: int, segments: int, chunk_size: int,
+                              checkpoint: Checkpoint = None, **kwargs) -> tuple:
     """
-    Download file.
+    Download a file as concurrent byte ranges.
 
     :param url: url of the file to download.
     :param path: path and file name of the file to save.
-    :param chunk_size: chunk size to read from the response.
+    :param cl: the content length of the file.
+    :param segments: the amount of concurrent ranges.
+    :param chunk_size: chunk size to read from the responses.
+    :param checkpoint: Checkpoint to resume from and record progress in.
     :return: path, size and header content length of file.
     """
+    if checkpoint is not None and checkpoint.done:
+        ranges = _segment_ranges(checkpoint.missing(), segments)
+        log.debug(f'resuming {url} to {path} at {checkpoint.completed} of {cl} bytes')
+        mode = 'r+b'
+    else:
+        ranges = _segment_ranges([(0, cl - 1)], segments)
+        log.debug(f'downloading {url} to {path} in {len(ranges)} segments')
+        mode = 'wb'
+
+    import aiofile
+    async with aiofile.AIOFile(path, mode) as f:
+        if mode == 'wb':
+            await f.truncate(cl)
+
+        saver = None
+        if checkpoint is not None:
+            # the sidecar marks the file as partial until it is complete
+            checkpoint.save()
+            saver = asyncio.ensure_future(_autosave(checkpoint))
+
+        try:
+            results = await asyncio.gather(*[
+                _download_segment(url, f, start, end, chunk_size, checkpoint, **kwargs)
+                for start, end in ranges])
+
+        except BaseException:
+            if checkpoint is not None:
+                checkpoint.save()
+            raise
+
+        finally:
+            if saver is not None:
+                saver.cancel()
+
+    if checkpoint is not None:
+        if any(status == 200 for status, _ in results):
+            log.error(f'{url} changed since the last attempt, discarding partial data')
+            checkpoint.remove(partial=True)
+            return '', 0, 0
+
+        if checkpoint.missing():
+            checkpoint.save()
+            log.error(f'incomplete download of {url}, '
+                      f'{checkpoint.completed} of {cl} bytes saved for resume')
+            return '', 0, 0
+
+        checkpoint.remove()
+
+    elif sum(n for _, n in results) != cl:
+        log.error(f'incomplete download of {url}')
+        os.remove(path)
+        return '', 0, 0
+
+    log.debug(f'downloaded {cl} bytes from {url}')
+    return path, cl, cl
+
+
+class DownloadResult(tuple):
+    """
+    The path, size and header content length of a downloaded file.
+
+    Unpacks like the plain 3 tuple download_file used to return,
+    the hex digests computed while downloading are in digests.
+    """
+    def __new__(cls, path: str = '', size: int = 0, content_length: int = 0,
+                digests: dict = None):
+        result = super().__new__(cls, (path, size, content_length))
+        result.digests = digests or {}
+        return result
+
+    @property
+    def path(self) -> str:
+        return self[0]
+
+    @property
+    def size(self) -> int:
+        return self[1]
+
+    @property
+    def content_length(self) -> int:
+        return self[2]
+
+
+def _hashers(digests: dict) -> dict:
+    """ hashlib objects for the algorithms in digests. """
+    return {name: hashlib.new(name) for name in digests or {}}
+
+
+async def _hash_file(path: str, hashers: dict, chunk_size: int) -> None:
+    """ Feed a file to hashlib objects. """
+    import aiofile
+    async with aiofile.async_open(path, 'rb') as f:
+        async for data in f.iter_chunked(max(chunk_size, 1024 * 1024)):
+            for hasher in hashers.values():
+                hasher.update(data)
+
+
+def _verify(url: str, hashers: dict, digests: dict):
+    """
+    Compare computed digests with the expected ones.
+
+    :return: dictionary of algorithm: hex digest, or None on mismatch.
+    """
+    computed = {name: hasher.hexdigest() for name, hasher in hashers.items()}
+    for name, expected in (digests or {}).items():
+        if expected is not None and expected.lower() != computed[name]:
+            log.error(f'{name} mismatch for {url}, expected {expected}, got {computed[name]}')
+            return None
+    return computed
+
+
+def _identity(url: str, kwargs: dict) -> dict:
+    """ Request keywords asking for the unencoded representation. """
+    kwargs = dict(kwargs)
+    headers = dict(default_headers(kwargs.pop('headers', None), kwargs.pop('rua', False), url))
+    headers['Accept-Encoding'] = 'identity'
+    kwargs['headers'] = headers
+    return kwargs
+
+
+async def download_file(url: str, path: str, chunk_size: int = 4096, segments: int = 1,
+                        resume: bool = False, digests: dict = None,
+                        write_size: int = 1024 * 1024, decode: bool = True,
+                        **kwargs) -> DownloadResult:
+    """
+    Download file.
+
+    If segments is greater than 1 and the server supports byte
+    ranges, the file will be downloaded as that many concurrent
+    range requests. Otherwise a single stream is used.
+
+    With resume, completed ranges are recorded in a sidecar file
+    next to the download. A failed download keeps its partial data,
+    and the next call only requests the missing ranges, as long as
+    the ETag/Last-Modified validators of the resource did not change.
+
+    Digests are computed while the data is written. Segmented
+    downloads arrive out of order, so they are hashed from disk
+    once complete. A download not matching the Content-Length or an
+    expected digest is removed.
+
+    A compressed response is decoded while it streams in, unless decode
+    is False, which stores the body as sent and checks it against the
+    Content-Length. Byte ranges of a encoded representation can not be
+    decoded separately, so segmented downloads that decode ask for the
+    unencoded representation.
+
+    :param url: url of the file to download.
+    :param path: path and file name of the file to save.
+    :param chunk_size: initial chunk size to read from the response,
+    grows while the reads come back full.
+    :param segments: the amount of concurrent range requests.
+    :param resume: resume a previously failed download.
+    :param digests: dictionary of hashlib algorithm: expected hex digest,
+    use None as digest to only compute it.
+    :param write_size: size of the blocks written to the file.
+    :param decode: decode a compressed response, else store it raw.
+    :return: DownloadResult, path, size and header content length of file.
+    """
+    # aiofile is only needed for downloads, keep it out of `import web`
+    import aiofile
+
+    hashers = _hashers(digests)
+    if not decode:
+        kwargs['auto_decompress'] = False
+
+    if segments > 1 or resume:
+        range_kwargs = _identity(url, kwargs) if decode else kwargs
+        headers = await _probe(url, **range_kwargs)
+        if headers is not None:
+            cl = int(headers['Content-Length'])
+            checkpoint = None
+
+            if resume:
+                etag = headers.get('ETag')
+                last_modified = headers.get('Last-Modified')
+
+                checkpoint = Checkpoint.load(path)
+                if checkpoint is not None and not checkpoint.matches(cl, etag, last_modified):
+                    log.debug(f'validators for {url} changed, discarding partial data')
+                    checkpoint.remove(partial=True)
+                    checkpoint = None
+
+                if checkpoint is None:
+                    checkpoint = Checkpoint(path, url, cl, etag, last_modified)
+
+            result = await _download_segmented(url, path, cl, max(1, segments), chunk_size,
+                                               checkpoint, write_size=write_size, **range_kwargs)
+            if not result[0] or not hashers:
+                return DownloadResult(*result)
+
+            await _hash_file(path, hashers, chunk_size)
+            computed = _verify(url, hashers, digests)
+            if computed is None:
+                os.remove(path)
+                return DownloadResult()
+
+            return DownloadResult(*result, computed)
+
+        log.debug(f'{url} does not support ranges, using a single stream')
+
     response = await request('GET', url=url, **kwargs)
 
     if response is not None:
@@ -117,21 +782,136 @@ async def download_file(url: str, path: str,
         cl = int(response.headers.get('Content-Length', 0))
         log.debug(f'downloading {url} to {path}')
 
-        async with aiofile.async_open(path, 'wb') as f:
+        try:
+            async with aiofile.AIOFile(path, 'wb') as f:
+                size, error = await _write_stream(response.content, f, hashers=hashers,
+                                                  chunk_size=chunk_size, write_size=write_size)
+        except OSError:
+            # a failed write, e.g. a full disk, leaves no partial file behind
+            response.release()
+            if os.path.exists(path):
+                os.remove(path)
+            raise
+
+        complete = error is None
+        if complete:
+            log.debug(f'downloaded {size} bytes from {url}')
+        else:
+            log.error(f'download of {url} interrupted at {size} bytes: {error}')
+
+        response.release()
 
-            size = 0
-            while True:
+        # a decoded body does not match the Content-Length
+        encoded = decode and response.headers.get('Content-Encoding', 'identity') != 'identity'
+        if complete and cl > 0 and not encoded and size != cl:
+            log.error(f'incomplete download of {url}, got {size} of {cl} bytes')
+            complete = False
+
+        computed = _verify(url, hashers, digests) if complete else None
+        if not complete or computed is None:
+            os.remove(path)
+            return DownloadResult()
+
+        return DownloadResult(path, size, cl, computed)
+
+    return DownloadResult()
+
+
+async def _aiter(iterable):
+    """ Wrap a plain iterable as an async iterator. """
+    for item in iterable:
+        yield item
 
-                data = await response.content.read(chunk_size)
-                if not data:
-                    log.debug(f'downloaded {size} bytes from {url}')
-                    break
-                await f.write(data)
-                size += len(data)
 
-        return path, size, cl
+async def _read(response):
+    """ Default fetch_many handler, reads the body in to the response. """
+    await response.read()
+    return response
 
-    return '', 0, 0
+
+async def fetch_many(urls, method: str = 'GET', concurrency: int = 10, per_host: int = 0,
+                     ordered: bool = False, handler=None, **kwargs):
+    """
+    Request many urls with bounded concurrency.
+
+    Urls are taken from the (async) iterable only when a slot is free,
+    so memory stays flat regardless of the length of the input. Each
+    response is passed to handler and released before its slot is
+    reused.
+
+    :param urls: iterable or async iterable of urls.
+    :param method: request method.
+    :param concurrency: maximum amount of requests in flight.
+    :param per_host: maximum amount of requests in flight per host, 0 for no limit.
+    :param ordered: yield results in input order instead of completion order.
+    :param handler: coroutine function called with each response, the default
+    reads the body and returns the response.
+    :return: async iterator of (url, result) tuples, result is None on error.
+    """
+    handler = handler or _read
+    hosts = {}
+
+    async def fetch(url):
+        host = urlsplit(url).hostname
+        if per_host > 0:
+            if host not in hosts:
+                hosts[host] = [asyncio.Semaphore(per_host), 0]
+            hosts[host][1] += 1
+            try:
+                async with hosts[host][0]:
+                    return await _fetch(url)
+            finally:
+                hosts[host][1] -= 1
+                if hosts[host][1] == 0:
+                    del hosts[host]
+
+        return await _fetch(url)
+
+    async def _fetch(url):
+        # a timeout or broken body fails its own url, not the batch
+        try:
+            response = await request(method, url=url, **kwargs)
+            if response is None:
+                return url, None
+            try:
+                return url, await handler(response)
+            finally:
+                response.release()
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            _fail(method, url, type(e).__name__, str(e))
+            return url, None
+
+    if hasattr(urls, '__aiter__'):
+        source = urls.__aiter__()
+    else:
+        source = _aiter(urls)
+
+    pending = deque()
+    exhausted = False
+    try:
+        while True:
+            while not exhausted and len(pending) < concurrency:
+                try:
+                    url = await source.__anext__()
+                except StopAsyncIteration:
+                    exhausted = True
+                else:
+                    pending.append(asyncio.ensure_future(fetch(url)))
+
+            if not pending:
+                break
+
+            if ordered:
+                yield await pending.popleft()
+            else:
+                done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    pending.remove(task)
+                    yield task.result()
+
+    finally:
+        for task in pending:
+            task.cancel()
 
 
 async def websocket(url: str, **kwargs):
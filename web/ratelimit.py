@@ -0,0 +1,209 @@
+# -*- coding: utf-8 -*-
+
+"""
+The MIT License (MIT)
+
+Copyright (c) 2024 Nortxort
+
+Permission is hereby granted, free of charge, to any person obtaining a
+copy of this software and associated documentation files (the "Software"),
+to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense,
+and/or sell copies of the Software, and to permit persons to whom the
+Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+DEALINGS IN THE SOFTWARE.
+"""
+
+import asyncio
+import fnmatch
+import logging
+import time
+from collections import OrderedDict
+
+
+log = logging.getLogger(__name__)
+
+
+class TokenBucket:
+    """
+    Token bucket with first come, first served waiting.
+
+    Acquiring reserves tokens immediately, letting the balance go
+    negative. A caller then sleeps exactly until its reservation is
+    covered, so waiters are served in order without polling.
+    """
+    def __init__(self, rate: float, burst: float = None):
+        """
+        Initialize the bucket.
+
+        :param rate: tokens added per second.
+        :param burst: bucket capacity, defaults to rate.
+        """
+        self.rate = rate
+        self.burst = burst if burst is not None else max(rate, 1)
+        self.tokens = self.burst
+        self.waiting = 0
+        self._updated = time.monotonic()
+
+    @property
+    def idle(self) -> bool:
+        """ True if the bucket is full and nobody waits, it then equals a new bucket. """
+        self._refill()
+        return self.waiting == 0 and self.tokens >= self.burst
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def consume(self, amount: float) -> float:
+        """
+        Take tokens without waiting.
+
+        :param amount: the amount of tokens.
+        :return: seconds until the balance is no longer negative.
+        """
+        self._refill()
+        self.tokens -= amount
+        return max(0.0, -self.tokens / self.rate)
+
+    async def acquire(self, amount: float = 1) -> None:
+        """
+        Take tokens, waiting until they are available.
+
+        :param amount: the amount of tokens.
+        """
+        delay = self.consume(amount)
+        if delay <= 0:
+            return
+
+        self.waiting += 1
+        try:
+            await asyncio.sleep(delay)
+        except asyncio.CancelledError:
+            # give back the reservation
+            self.tokens += amount
+            raise
+        finally:
+            self.waiting -= 1
+
+
+class RateLimiter:
+    """
+    Per host request and byte rate limits.
+
+    Rules match host names with shell style patterns, the first
+    matching rule applies. Every host matching a rule gets its own
+    buckets, hosts matching no rule are not limited and not kept.
+    """
+    default = None
+
+    def __init__(self, max_hosts: int = 10000):
+        """
+        Initialize the limiter.
+
+        :param max_hosts: amount of hosts to keep buckets for, beyond it the idle
+        buckets of the least recently used hosts are dropped.
+        """
+        self.rules = []
+        self.max_hosts = max_hosts
+        self._buckets = OrderedDict()
+
+    def add(self, pattern: str, requests: float = None, bytes: float = None,
+            burst: float = None, byte_burst: float = None) -> None:
+        """
+        Add a rule.
+
+        :param pattern: host pattern, e.g. `*.example.com` or `*`.
+        :param requests: requests per second.
+        :param bytes: bytes per second, counting request and response bodies.
+        :param burst: request bucket capacity, defaults to requests.
+        :param byte_burst: byte bucket capacity, defaults to bytes.
+        """
+        self.rules.append((pattern.lower(), requests, bytes, burst, byte_burst))
+        self._buckets.clear()
+
+    def buckets(self, host: str) -> tuple:
+        """
+        The buckets for a host.
+
+        :param host: the host name.
+        :return: request and byte TokenBucket, either may be None.
+        """
+        host = (host or '').lower()
+        buckets = self._buckets.get(host)
+        if buckets is not None:
+            self._buckets.move_to_end(host)
+            return buckets
+
+        buckets = (None, None)
+        for pattern, requests, nbytes, burst, byte_burst in self.rules:
+            if fnmatch.fnmatchcase(host, pattern):
+                buckets = (TokenBucket(requests, burst) if requests else None,
+                           TokenBucket(nbytes, byte_burst) if nbytes else None)
+                break
+
+        # unlimited hosts are not kept, under a crawl they would only grow
+        if buckets != (None, None):
+            self._buckets[host] = buckets
+            if len(self._buckets) > self.max_hosts:
+                self._evict()
+
+        return buckets
+
+    def _evict(self) -> None:
+        """ Drop idle buckets of the least recently used hosts, down to max_hosts. """
+        # the newest host is in use by the caller
+        for host in list(self._buckets)[:-1]:
+            if len(self._buckets) <= self.max_hosts:
+                return
+            if all(b is None or b.idle for b in self._buckets[host]):
+                del self._buckets[host]
+
+    async def acquire(self, host: str, nbytes: int = 0) -> None:
+        """
+        Wait for permission to send a request.
+
+        :param host: the host name.
+        :param nbytes: size of the request body.
+        """
+        requests, byte_bucket = self.buckets(host)
+        if requests is not None:
+            await requests.acquire()
+        if byte_bucket is not None:
+            await byte_bucket.acquire(nbytes)
+
+    def consume(self, host: str, nbytes: int) -> None:
+        """
+        Account received bytes, delaying later requests to the host.
+
+        :param host: the host name.
+        :param nbytes: the amount of bytes.
+        """
+        byte_bucket = self.buckets(host)[1]
+        if byte_bucket is not None and nbytes > 0:
+            byte_bucket.consume(nbytes)
+
+    def queue_depth(self, host: str = None):
+        """
+        The amount of requests waiting on the limits.
+
+        :param host: the host name, None for all hosts.
+        :return: the depth for host, or a dictionary of host: depth.
+        """
+        def depth(buckets):
+            return sum(b.waiting for b in buckets if b is not None)
+
+        if host is not None:
+            return depth(self._buckets.get(host.lower(), ()))
+        return {h: depth(b) for h, b in self._buckets.items()}
@@ -0,0 +1,148 @@
+# -*- coding: utf-8 -*-
+
+"""
+The MIT License (MIT)
+
+Copyright (c) 2024 Nortxort
+
+Permission is hereby granted, free of charge, to any person obtaining a
+copy of this software and associated documentation files (the "Software"),
+to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense,
+and/or sell copies of the Software, and to permit persons to whom the
+Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+DEALINGS IN THE SOFTWARE.
+"""
+
+import json
+
+from multidict import CIMultiDict, CIMultiDictProxy
+
+
+class _BufferReader:
+    """
+    Minimal aiohttp.StreamReader lookalike over a buffered body.
+    """
+    def __init__(self, body: bytes):
+        self._body = memoryview(body)
+        self._pos = 0
+
+    def at_eof(self) -> bool:
+        return self._pos >= len(self._body)
+
+    async def read(self, n: int = -1) -> bytes:
+        if n < 0:
+            n = len(self._body) - self._pos
+        data = self._body[self._pos:self._pos + n].tobytes()
+        self._pos += len(data)
+        return data
+
+    async def readany(self) -> bytes:
+        return await self.read(2 ** 16)
+
+    async def iter_chunked(self, n: int):
+        while not self.at_eof():
+            yield await self.read(n)
+
+
+class BufferedResponse:
+    """
+    A response with a fully buffered body.
+
+    Mirrors the parts of aiohttp.ClientResponse used by this package,
+    and is returned in place of it for responses served from the cache,
+    or shared between callers.
+    """
+    def __init__(self, method: str, url, status: int, reason: str,
+                 headers, body: bytes):
+        """
+        Initialize the response.
+
+        :param method: request method.
+        :param url: url of the response.
+        :param status: the response status code.
+        :param reason: the response reason phrase.
+        :param headers: mapping or list of (name, value) header pairs.
+        :param body: the response body.
+        """
+        self.method = method
+        self.url = url
+        self.status = status
+        self.reason = reason
+        self.headers = CIMultiDictProxy(CIMultiDict(headers))
+        self.content = _BufferReader(body)
+        self._body = body
+
+    def __repr__(self):
+        return f'<BufferedResponse({self.url}) [{self.status} {self.reason}]>'
+
+    @classmethod
+    async def from_response(cls, response):
+        """
+        Buffer a aiohttp.ClientResponse.
+
+        :param response: aiohttp.ClientResponse
+        :return: BufferedResponse
+        """
+        body = await response.read()
+        return cls(response.method, response.url, response.status,
+                   response.reason, response.headers, body)
+
+    def copy(self):
+        """
+        A independent reader over the same body.
+
+        :return: BufferedResponse
+        """
+        return BufferedResponse(self.method, self.url, self.status,
+                                self.reason, self.headers, self._body)
+
+    @property
+    def body(self) -> bytes:
+        return self._body
+
+    @property
+    def ok(self) -> bool:
+        return self.status < 400
+
+    @property
+    def content_type(self) -> str:
+        return self.headers.get('Content-Type', 'application/octet-stream').split(';')[0].strip()
+
+    @property
+    def charset(self):
+        for param in self.headers.get('Content-Type', '').split(';')[1:]:
+            key, _, value = param.strip().partition('=')
+            if key.lower() == 'charset':
+                return value.strip('"\'')
+
+    async def read(self) -> bytes:
+        return self._body
+
+    async def text(self, encoding: str = None, errors: str = 'strict') -> str:
+        return self._body.decode(encoding or self.charset or 'utf-8', errors)
+
+    async def json(self, *, encoding: str = None, loads=json.loads, content_type=None):
+        return loads(await self.text(encoding))
+
+    def release(self) -> None:
+        pass
+
+    def close(self) -> None:
+        pass
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args):
+        pass
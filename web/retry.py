@@ -0,0 +1,192 @@
+# -*- coding: utf-8 -*-
+
+"""
+The MIT License (MIT)
+
+Copyright (c) 2024 Nortxort
+
+Permission is hereby granted, free of charge, to any person obtaining a
+copy of this software and associated documentation files (the "Software"),
+to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense,
+and/or sell copies of the Software, and to permit persons to whom the
+Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+DEALINGS IN THE SOFTWARE.
+"""
+
+import logging
+import random
+import time
+from email.utils import parsedate_to_datetime
+
+
+log = logging.getLogger(__name__)
+
+IDEMPOTENT_METHODS = frozenset(['GET', 'HEAD', 'OPTIONS', 'TRACE', 'PUT', 'DELETE', 'websocket'])
+
+RETRY_STATUSES = frozenset([408, 425, 429, 500, 502, 503, 504])
+
+
+class CircuitBreaker:
+    """
+    Circuit breaker for a single host.
+
+    After threshold consecutive failures the circuit opens and
+    requests fail fast. Once timeout seconds passed a single trial
+    request is let through(half open), closing the circuit again
+    on success. A trial that never reports back, e.g. because it was
+    cancelled, expires after another timeout seconds.
+    """
+    def __init__(self, threshold: int = 5, timeout: float = 30.0):
+        """
+        Initialize the breaker.
+
+        :param threshold: consecutive failures before opening the circuit.
+        :param timeout: seconds to stay open before allowing a trial request.
+        """
+        self.threshold = threshold
+        self.timeout = timeout
+        self.failures = 0
+        self.opened_at = None
+        self._trial = None
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return 'closed'
+        if time.monotonic() - self.opened_at >= self.timeout:
+            return 'half-open'
+        return 'open'
+
+    def allow(self) -> bool:
+        """ Check if a request may be made. """
+        state = self.state
+        if state == 'closed':
+            return True
+        now = time.monotonic()
+        if state == 'half-open' and (self._trial is None or now - self._trial >= self.timeout):
+            self._trial = now
+            return True
+        return False
+
+    def release(self) -> None:
+        """ Give up a trial request that neither succeeded nor failed. """
+        self._trial = None
+
+    def success(self) -> None:
+        """ Record a successful request. """
+        self.failures = 0
+        self.opened_at = None
+        self._trial = None
+
+    def failure(self) -> None:
+        """ Record a failed request. """
+        self.failures += 1
+        self._trial = None
+        if self.failures >= self.threshold:
+            self.opened_at = time.monotonic()
+
+
+class RetryPolicy:
+    """
+    Retry policy with exponential backoff and per host circuit breakers.
+    """
+    def __init__(self, attempts: int = 3, backoff: float = 0.5, max_backoff: float = 30.0,
+                 deadline: float = None, statuses=RETRY_STATUSES, methods=IDEMPOTENT_METHODS,
+                 breaker_threshold: int = 5, breaker_timeout: float = 30.0):
+        """
+        Initialize the policy.
+
+        :param attempts: maximum attempts per request, including the first.
+        :param backoff: base delay of the exponential backoff in seconds.
+        :param max_backoff: maximum delay between attempts in seconds.
+        :param deadline: overall seconds a request may take including retries.
+        :param statuses: response status codes to retry.
+        :param methods: request methods to retry.
+        :param breaker_threshold: consecutive failures opening a host circuit, 0 to disable.
+        :param breaker_timeout: seconds a host circuit stays open.
+        """
+        self.attempts = attempts
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.deadline = deadline
+        self.statuses = frozenset(statuses)
+        self.methods = frozenset(methods)
+        self.breaker_threshold = breaker_threshold
+        self.breaker_timeout = breaker_timeout
+        self.breakers = {}
+
+    def breaker(self, host: str):
+        """
+        The circuit breaker for a host.
+
+        :param host: the host name.
+        :return: CircuitBreaker or None if disabled.
+        """
+        if self.breaker_threshold <= 0:
+            return None
+        if host not in self.breakers:
+            self.breakers[host] = CircuitBreaker(self.breaker_threshold, self.breaker_timeout)
+        return self.breakers[host]
+
+    def retryable(self, method: str, response) -> bool:
+        """
+        Check if a request should be retried.
+
+        :param method: the request method.
+        :param response: the response, or None on a connection error.
+        :return: True if the request can be retried.
+        """
+        if method not in self.methods:
+            return False
+        if response is None:
+            return True
+        # a websocket response is a completed handshake, it has no status
+        return method != 'websocket' and response.status in self.statuses
+
+    def delay(self, attempt: int, response=None) -> float:
+        """
+        The delay before the next attempt.
+
+        Retry-After on 429 and 503 responses takes precedence over
+        the backoff, which uses full jitter.
+
+        :param attempt: the zero based attempt that failed.
+        :param response: the failed response, if any.
+        :return: delay in seconds.
+        """
+        if response is not None and response.status in (429, 503):
+            retry_after = retry_after_seconds(response.headers.get('Retry-After'))
+            if retry_after is not None:
+                return min(retry_after, self.max_backoff)
+
+        return random.uniform(0, min(self.max_backoff, self.backoff * 2 ** attempt))
+
+
+def retry_after_seconds(value: str):
+    """
+    Parse a Retry-After header.
+
+    :param value: delay in seconds or a HTTP date.
+    :return: seconds to wait, or None if invalid.
+    """
+    if value is None:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError, IndexError, OverflowError):
+        return None
@@ -26,40 +26,253 @@ DEALINGS IN THE SOFTWARE.
 
 import asyncio
 import logging
+import socket
+import ssl
 
 import aiohttp
 
+from .cookies import IndexedCookieJar, read_snapshot, write_snapshot
+from .timing import Timings
+
 
 log = logging.getLogger(__name__)
 
+# connector tuning profiles, see make_connector
+PROFILES = {
+    # many hosts, many short lived requests
+    'crawl': {
+        'limit': 512,
+        'limit_per_host': 8,
+        'keepalive_timeout': 30,
+        'ttl_dns_cache': 600,
+        'sndbuf': 64 * 1024,
+        'rcvbuf': 256 * 1024
+    },
+    # few hosts, small latency sensitive requests
+    'api': {
+        'limit': 128,
+        'limit_per_host': 32,
+        'keepalive_timeout': 120,
+        'ttl_dns_cache': 300,
+        'sndbuf': 64 * 1024,
+        'rcvbuf': 64 * 1024,
+        'nodelay': True
+    },
+    # few connections moving a lot of data
+    'download': {
+        'limit': 64,
+        'limit_per_host': 16,
+        'keepalive_timeout': 60,
+        'ttl_dns_cache': 300,
+        'sndbuf': 64 * 1024,
+        'rcvbuf': 4 * 1024 * 1024
+    }
+}
+
+_ssl_context = None
+
+
+def ssl_context() -> ssl.SSLContext:
+    """
+    The shared SSL context.
+
+    Sharing the context between connectors avoids loading the CA
+    store for every session.
+
+    :return: ssl.SSLContext
+    """
+    global _ssl_context
+    if _ssl_context is None:
+        _ssl_context = ssl.create_default_context()
+    return _ssl_context
+
+
+def _socket_factory(sndbuf: int = None, rcvbuf: int = None, nodelay: bool = False):
+    """
+    Create a socket factory setting buffer sizes and TCP_NODELAY.
+
+    :param sndbuf: socket send buffer size.
+    :param rcvbuf: socket receive buffer size.
+    :param nodelay: disable Nagle's algorithm.
+    :return: socket factory for aiohttp.TCPConnector
+    """
+    def factory(addr_info):
+        family, type_, proto, _, _ = addr_info
+        sock = socket.socket(family=family, type=type_, proto=proto)
+        try:
+            if sndbuf:
+                sock.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, sndbuf)
+            if rcvbuf:
+                sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, rcvbuf)
+            if nodelay:
+                sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        except OSError as e:
+            log.debug(f'failed to set socket options: {e}')
+        return sock
+
+    return factory
+
+
+def make_connector(profile: str, **kwargs) -> aiohttp.TCPConnector:
+    """
+    Create a tuned aiohttp.TCPConnector from a profile.
+
+    :param profile: name of the profile, see PROFILES.
+    :param kwargs: overrides for the profile settings.
+    :return: aiohttp.TCPConnector
+    """
+    settings = dict(PROFILES[profile], **kwargs)
+    sndbuf = settings.pop('sndbuf', None)
+    rcvbuf = settings.pop('rcvbuf', None)
+    nodelay = settings.pop('nodelay', False)
+    settings.setdefault('ssl', ssl_context())
+
+    try:
+        connector = aiohttp.TCPConnector(
+            socket_factory=_socket_factory(sndbuf, rcvbuf, nodelay), **settings)
+    except TypeError:
+        # socket_factory requires aiohttp >= 3.12
+        log.debug('socket_factory not supported, using default socket options')
+        connector = aiohttp.TCPConnector(**settings)
+
+    log.debug(f'created `{profile}` connector: `{connector}`')
+    return connector
+
+
+class _hybridmethod:
+    """
+    Method bound to the instance when called on one, else to the class.
+
+    This lets the Session classmethods operate on the default session
+    when called on the class, and on a named session when called on an
+    instance of it.
+    """
+    def __init__(self, func):
+        self.__func__ = func
+        self.__doc__ = func.__doc__
+
+    def __get__(self, obj, cls=None):
+        return self.__func__.__get__(cls if obj is None else obj)
+
 
 class Session:
     """
     Session class maintaining cookies across requests.
+
+    Used on the class, the session is the shared default session.
+    Instances are independent sessions with their own connector
+    and cookie jar.
     """
     session = None
     connector = None
-    _cookie_to_delete = None
+    _cookies = None
+    _profile = None
+    _timings = None
+    rotation = None
+    _sessions = {}
+
+    def __init__(self, name: str = None, cookies: dict = None,
+                 connector=None, profile: str = None, timings=None, rotation=None):
+        """
+        Create a independent session.
+
+        :param name: Optional name to register the session under.
+        :param cookies: User provided cookies for the session.
+        :param connector: aiohttp.BaseConnector for the session.
+        :param profile: Connector profile to use if no connector is given, see PROFILES.
+        :param timings: Timings object recording the requests, defaults to Timings.default.
+        :param rotation: agent.Rotation used for requests without headers, e.g. agent.Sticky.
+        """
+        self.name = name
+        self.session = None
+        self.connector = connector
+        self._profile = profile
+        self._cookies = cookies
+        self._timings = timings
+        self.rotation = rotation
+
+        if name is not None:
+            Session._sessions[name] = self
+
+    def __repr__(self):
+        return f'<Session name={self.name!r} session={self.session!r}>'
+
+    @classmethod
+    def named(cls, name: str, **kwargs):
+        """
+        Get a named session, creating it if it does not exist.
+
+        :param name: The name of the session.
+        :param kwargs: Arguments for a new session, see Session.__init__
+        :return: Session instance.
+        """
+        if name not in cls._sessions:
+            return cls(name, **kwargs)
+        return cls._sessions[name]
+
+    @classmethod
+    def sessions(cls) -> dict:
+        """ All named sessions. """
+        return dict(cls._sessions)
 
     @classmethod
-    def create(cls, cookies: dict = None, connector=None):
+    def resolve(cls, session=None):
+        """
+        Resolve a session argument.
+
+        :param session: None for the default session, a session name or a Session instance.
+        :return: Session class or instance.
+        """
+        if session is None:
+            return cls
+        if isinstance(session, str):
+            return cls.named(session)
+        return session
+
+    @_hybridmethod
+    def create(cls, cookies: dict = None, connector=None, profile: str = None, timings=None):
         """
         Create a new aiohttp.ClientSession object.
 
         :param cookies: User provided cookies for session.
         :param connector:
+        :param profile: Connector profile to use if no connector is given, see PROFILES.
+        :param timings: Timings object recording the requests, defaults to Timings.default.
         :return: aiohttp.ClientSession object.
         """
         if connector is not None:
             # try, except?
             cls.connector = connector
 
-        cls.session = aiohttp.ClientSession(cookies=cookies, connector=cls.connector)
+        profile = profile or cls._profile
+        if profile is not None and (cls.connector is None or cls.connector.closed):
+            cls.connector = make_connector(profile)
+
+        if cookies is None:
+            cookies = cls._cookies
+
+        timings = timings or cls._timings or Timings.default
+        trace_configs = [timings.trace_config()] if timings is not None else None
+
+        cls.session = aiohttp.ClientSession(cookies=cookies, connector=cls.connector,
+                                            cookie_jar=IndexedCookieJar(),
+                                            trace_configs=trace_configs)
         log.debug(f'creating session: `{cls.session}`, connector: `{cls.connector}`')
 
         return cls.session
 
-    @classmethod
+    @_hybridmethod
+    def client(cls):
+        """
+        The aiohttp.ClientSession object, created if needed.
+
+        :return: aiohttp.ClientSession object.
+        """
+        if cls.session is None:
+            return cls.create()
+        return cls.session
+
+    @_hybridmethod
     async def close(cls, delay: float = 0.250) -> None:
         """
         Close the session object.
@@ -74,27 +287,27 @@ class Session:
             await asyncio.sleep(delay)
             cls.session = None
 
-    @classmethod
+    @_hybridmethod
     async def close_connector(cls):
         if cls.connector is not None:
             log.debug(f'closing connector, type: `{type(cls.connector)}`')
             await cls.connector.close()
             cls.connector = None
 
-    @classmethod
+    @_hybridmethod
     async def reset(cls):
         """ Reset the session and connector to their initial state(None). """
         log.debug(f'reset, session={cls.session}, connector={cls.connector}')
         await cls.close()
         await cls.close_connector()
 
-    @classmethod
+    @_hybridmethod
     def cookie_jar(cls):
         """ All the cookies for the session. """
         if cls.session is not None:
             return cls.session.cookie_jar
 
-    @classmethod
+    @_hybridmethod
     def cookies(cls, domain: str, name: str = None):
         """
         Get cookie(s) for a specific domain.
@@ -108,24 +321,17 @@ class Session:
         None will be returned if no cookies for the domain exists,
         or if there is no cookie with that name.
         """
-        domain_cookies = []
         if cls.session is not None:
+            jar = cls.session.cookie_jar
 
-            for cookie in cls.session.cookie_jar:
-                if cookie['domain'] == domain:
-                    domain_cookies.append(cookie)
+            if name is None:
+                log.debug(f'cookies lookup for: `{domain}`')
+                return jar.domain_cookies(domain) or None
 
-            if len(domain_cookies) > 0:
-                if name is None:
-                    log.debug(f'cookies lookup for: `{domain}`')
-                    return domain_cookies
-                else:
-                    log.debug(f'cookie lookup for: `{domain}`, cookie name: `{name}`')
-                    for cookie in domain_cookies:
-                        if cookie.key == name:
-                            return cookie
+            log.debug(f'cookie lookup for: `{domain}`, cookie name: `{name}`')
+            return jar.get(domain, name)
 
-    @classmethod
+    @_hybridmethod
     def filter_cookies(cls, request_url: str):
         """
         Filter cookies by request url.
@@ -139,14 +345,14 @@ class Session:
             log.debug(f'filtering cookies for: `{request_url}`')
             return cls.session.cookie_jar.filter_cookies(request_url)
 
-    @classmethod
+    @_hybridmethod
     def delete_all_cookies(cls) -> None:
         """ Delete all session cookies. """
         if cls.session is not None:
             log.debug(f'deleting `{len(cls.session.cookie_jar)}` session cookies')
             cls.session.cookie_jar.clear(None)
 
-    @classmethod
+    @_hybridmethod
     def delete_cookies_by_domain(cls, domain) -> None:
         """
         Delete all cookies for domain and subdomains.
@@ -158,7 +364,7 @@ class Session:
             log.debug(f'deleting cookies for domain: `{domain}`')
             cls.session.cookie_jar.clear_domain(domain)
 
-    @classmethod
+    @_hybridmethod
     def delete_cookie_by_name(cls, domain: str, name: str) -> None:
         """
         Delete cookie by name.
@@ -168,15 +374,37 @@ class Session:
         :param name: The name of the cookie to delete.
         :type name: str
         """
-        cookie = cls.cookies(domain, name)
-        if cookie is not None:
-            cls._cookie_to_delete = cookie
-            cls.session.cookie_jar.clear(cls._has_cookie_to_delete)
+        if cls.session is not None:
+            cls.session.cookie_jar.delete(domain, name)
 
-    @classmethod
-    def _has_cookie_to_delete(cls, morsel):
-        if (morsel.key == cls._cookie_to_delete.key and
-                morsel['domain'] == cls._cookie_to_delete['domain']):
-            log.debug(f'deleting morsel: `{morsel}`')
-            return True
-        return False
+    @_hybridmethod
+    async def save_cookies(cls, path: str) -> None:
+        """
+        Save the session cookies to a snapshot file.
+
+        Only cookies changed since the last save are appended,
+        the file is compacted now and then.
+
+        :param path: The path of the snapshot file.
+        :type path: str
+        """
+        if cls.session is not None:
+            lines, mode = cls.session.cookie_jar.snapshot(path)
+            log.debug(f'saving `{len(lines)}` cookie records to: `{path}`, mode: `{mode}`')
+            await asyncio.get_running_loop().run_in_executor(
+                None, write_snapshot, path, lines, mode)
+
+    @_hybridmethod
+    async def load_cookies(cls, path: str) -> None:
+        """
+        Load session cookies from a snapshot file.
+
+        The file is read in a executor thread, and the cookies of a
+        domain are only added to the jar when the domain is first used.
+
+        :param path: The path of the snapshot file.
+        :type path: str
+        """
+        records = await asyncio.get_running_loop().run_in_executor(None, read_snapshot, path)
+        log.debug(f'loaded cookies for `{len(records) - 1}` domains from: `{path}`')
+        cls.client().cookie_jar.load_snapshot(path, records)
@@ -0,0 +1,191 @@
+# -*- coding: utf-8 -*-
+
+"""
+The MIT License (MIT)
+
+Copyright (c) 2024 Nortxort
+
+Permission is hereby granted, free of charge, to any person obtaining a
+copy of this software and associated documentation files (the "Software"),
+to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense,
+and/or sell copies of the Software, and to permit persons to whom the
+Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+DEALINGS IN THE SOFTWARE.
+"""
+
+import json
+import logging
+from collections import namedtuple
+
+from .http import default_headers, request
+
+
+log = logging.getLogger(__name__)
+
+ServerSentEvent = namedtuple('ServerSentEvent', ['event', 'data', 'id', 'retry'])
+
+
+async def iter_lines(response, decode: bool = True, chunk_size: int = 64 * 1024,
+                     max_line: int = 16 * 1024 * 1024):
+    """
+    Iterate the lines of a response body.
+
+    The body is read in chunks in to a single buffer, so memory use
+    is bound by the chunk size plus the longest line.
+
+    :param response: aiohttp.ClientResponse or BufferedResponse
+    :param decode: decode the lines to str using the response charset.
+    :param chunk_size: amount of bytes to read at once.
+    :param max_line: maximum line length, raises ValueError if exceeded.
+    :return: async iterator of lines without line endings.
+    """
+    encoding = (getattr(response, 'charset', None) or 'utf-8') if decode else None
+    buf = bytearray()
+    scan = 0
+
+    while True:
+        chunk = await response.content.read(chunk_size)
+        if not chunk:
+            break
+        buf += chunk
+
+        lines = []
+        start = 0
+        view = memoryview(buf)
+        while True:
+            end = buf.find(b'\n', scan)
+            if end < 0:
+                break
+            stop = end - 1 if end > start and buf[end - 1] == 13 else end
+            lines.append(bytes(view[start:stop]))
+            start = scan = end + 1
+        view.release()
+
+        del buf[:start]
+        scan = len(buf)
+        if scan > max_line:
+            raise ValueError(f'line exceeds {max_line} bytes')
+
+        for line in lines:
+            yield line.decode(encoding) if encoding else line
+
+    if buf:
+        line = bytes(buf)
+        yield line.decode(encoding) if encoding else line
+
+
+async def iter_ndjson(response, loads=json.loads, **kwargs):
+    """
+    Iterate the records of a newline delimited JSON response.
+
+    :param response: aiohttp.ClientResponse or BufferedResponse
+    :param loads: function decoding a record.
+    :param kwargs: keywords for iter_lines
+    :return: async iterator of decoded records.
+    """
+    async for line in iter_lines(response, decode=False, **kwargs):
+        if line.strip():
+            yield loads(line)
+
+
+async def iter_sse(response, **kwargs):
+    """
+    Iterate the events of a server-sent events response.
+
+    :param response: aiohttp.ClientResponse or BufferedResponse
+    :param kwargs: keywords for iter_lines
+    :return: async iterator of ServerSentEvent
+    """
+    event = ''
+    data = []
+    last_id = None
+    retry = None
+
+    async for line in iter_lines(response, decode=True, **kwargs):
+        if not line:
+            # dispatch the event, https://html.spec.whatwg.org/#dispatchMessage
+            if data:
+                yield ServerSentEvent(event or 'message', '\n'.join(data), last_id, retry)
+            event = ''
+            data = []
+            continue
+
+        if line.startswith(':'):
+            continue
+
+        field, _, value = line.partition(':')
+        if value.startswith(' '):
+            value = value[1:]
+
+        if field == 'data':
+            data.append(value)
+        elif field == 'event':
+            event = value
+        elif field == 'id' and '\0' not in value:
+            last_id = value
+        elif field == 'retry' and value.isdigit():
+            retry = int(value)
+
+    if data:
+        yield ServerSentEvent(event or 'message', '\n'.join(data), last_id, retry)
+
+
+async def _stream(iterator, method: str, url: str, options: dict, **kwargs):
+    response = await request(method, url=url, **kwargs)
+    if response is None:
+        return
+
+    try:
+        async for item in iterator(response, **options):
+            yield item
+    finally:
+        response.release()
+
+
+def stream_lines(url: str, method: str = 'GET', decode: bool = True, **kwargs):
+    """
+    Request a url and iterate the lines of the response body.
+
+    :param url: url of the resource.
+    :param method: request method.
+    :param decode: decode the lines to str.
+    :return: async iterator of lines, empty on error.
+    """
+    return _stream(iter_lines, method, url, {'decode': decode}, **kwargs)
+
+
+def stream_ndjson(url: str, method: str = 'GET', loads=json.loads, **kwargs):
+    """
+    Request a url and iterate the records of a newline delimited JSON body.
+
+    :param url: url of the resource.
+    :param method: request method.
+    :param loads: function decoding a record.
+    :return: async iterator of records, empty on error.
+    """
+    return _stream(iter_ndjson, method, url, {'loads': loads}, **kwargs)
+
+
+def stream_events(url: str, method: str = 'GET', **kwargs):
+    """
+    Request a url and iterate the server-sent events.
+
+    :param url: url of the resource.
+    :param method: request method.
+    :return: async iterator of ServerSentEvent, empty on error.
+    """
+    if kwargs.get('headers') is None:
+        kwargs['headers'] = dict(default_headers(rua=kwargs.pop('rua', False), url=url),
+                                 Accept='text/event-stream')
+    return _stream(iter_sse, method, url, {}, **kwargs)
@@ -0,0 +1,293 @@
+# -*- coding: utf-8 -*-
+
+"""
+The MIT License (MIT)
+
+Copyright (c) 2024 Nortxort
+
+Permission is hereby granted, free of charge, to any person obtaining a
+copy of this software and associated documentation files (the "Software"),
+to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense,
+and/or sell copies of the Software, and to permit persons to whom the
+Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+DEALINGS IN THE SOFTWARE.
+"""
+
+# Blocking api for threaded code.
+#
+# Every call is submitted to one event loop running in a background
+# thread, so connections, DNS cache and TLS sessions are reused across
+# calls and threads. Responses are returned fully read, as
+# BufferedResponse objects.
+#
+#     from web import sync
+#
+#     response = sync.get('https://example.com')
+#     print(response.status, response.body)
+#
+# Do not mix with asyncio.run on the same sessions, a aiohttp session
+# belongs to the loop it was created on.
+
+import asyncio
+import atexit
+import logging
+import os
+import threading
+
+from . import http
+from .response import BufferedResponse
+from .session import Session
+
+
+log = logging.getLogger(__name__)
+
+
+class _LoopThread:
+    """ A event loop running forever in a daemon thread. """
+    def __init__(self):
+        self.loop = None
+        self.thread = None
+        self.pid = None
+        self._lock = threading.Lock()
+
+    def _start(self) -> None:
+        ready = threading.Event()
+
+        def run():
+            asyncio.set_event_loop(self.loop)
+            self.loop.call_soon(ready.set)
+            self.loop.run_forever()
+
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=run, name='web-sync-loop', daemon=True)
+        self.thread.start()
+        ready.wait()
+        self.pid = os.getpid()
+        log.debug(f'started event loop thread {self.thread.name}')
+
+    def running(self) -> bool:
+        return self.thread is not None and self.thread.is_alive() and self.pid == os.getpid()
+
+    def run(self, coro):
+        """
+        Run a coroutine on the loop and wait for the result.
+
+        :param coro: the coroutine.
+        :return: the result of the coroutine.
+        """
+        if not self.running():
+            with self._lock:
+                # a forked child inherits the loop, but not its thread
+                if not self.running():
+                    self._start()
+
+        if threading.current_thread() is self.thread:
+            coro.close()
+            raise RuntimeError('sync functions can not be called from the sync event loop')
+
+        return asyncio.run_coroutine_threadsafe(coro, self.loop).result()
+
+    def stop(self) -> None:
+        """ Close all sessions and stop the loop. """
+        with self._lock:
+            if not self.running():
+                return
+
+            try:
+                asyncio.run_coroutine_threadsafe(_close_sessions(), self.loop).result(timeout=5)
+            except Exception as e:
+                log.error(f'closing sessions failed: {e}')
+
+            self.loop.call_soon_threadsafe(self.loop.stop)
+            self.thread.join(timeout=5)
+            self.loop.close()
+            self.loop = self.thread = None
+
+
+async def _close_sessions() -> None:
+    await Session.reset()
+    for session in Session.sessions().values():
+        await session.reset()
+
+
+_runner = _LoopThread()
+_local = threading.local()
+
+atexit.register(_runner.stop)
+
+
+def run(coro):
+    """
+    Run a coroutine on the background event loop.
+
+    :param coro: the coroutine, e.g. web.fetch_many handling code.
+    :return: the result of the coroutine.
+    """
+    return _runner.run(coro)
+
+
+def close() -> None:
+    """ Close all sessions and stop the background event loop, it restarts on the next call. """
+    _runner.stop()
+
+
+def last_error():
+    """
+    The most recent request failure of the calling thread.
+
+    :return: http.RequestError or None.
+    """
+    return getattr(_local, 'error', None)
+
+
+async def _buffered(method: str, url: str, **kwargs):
+    response = await http.request(method, url, **kwargs)
+    if response is None:
+        return None, http.last_error()
+
+    if isinstance(response, BufferedResponse):
+        return response, None
+
+    try:
+        return await BufferedResponse.from_response(response), None
+    finally:
+        response.release()
+
+
+def request(method: str, url: str, **kwargs):
+    """
+    Blocking HTTP request, see http.request.
+
+    :param method: request method.
+    :param url: url for the request.
+    :return: BufferedResponse or None on error, see last_error.
+    :rtype: BufferedResponse | None
+    """
+    response, _local.error = run(_buffered(method, url, **kwargs))
+    return response
+
+
+def get(url: str, **kwargs):
+    """
+    Blocking GET request.
+
+    :param url: url of the resource.
+    :return: BufferedResponse or None.
+    """
+    return request('GET', url, **kwargs)
+
+
+def post(url: str, **kwargs):
+    """
+    Blocking POST request.
+
+    :param url: url of the resource.
+    :return: BufferedResponse or None.
+    """
+    return request('POST', url, **kwargs)
+
+
+def put(url: str, **kwargs):
+    """
+    Blocking PUT request.
+
+    :param url: url of the resource.
+    :return: BufferedResponse or None.
+    """
+    return request('PUT', url, **kwargs)
+
+
+def patch(url: str, **kwargs):
+    """
+    Blocking PATCH request.
+
+    :param url: url of the resource.
+    :return: BufferedResponse or None.
+    """
+    return request('PATCH', url, **kwargs)
+
+
+def delete(url: str, **kwargs):
+    """
+    Blocking DELETE request.
+
+    :param url: url of the resource.
+    :return: BufferedResponse or None.
+    """
+    return request('DELETE', url, **kwargs)
+
+
+def download_file(url: str, path: str, **kwargs):
+    """
+    Blocking file download, see http.download_file.
+
+    :param url: url of the file to download.
+    :param path: path and file name of the file to save.
+    :return: DownloadResult, path, size and header content length of file.
+    """
+    return run(http.download_file(url, path, **kwargs))
+
+
+async def _call(session, name: str, *args):
+    result = getattr(Session.resolve(session), name)(*args)
+    if asyncio.iscoroutine(result):
+        result = await result
+    return result
+
+
+def cookies(domain: str, name: str = None, session=None):
+    """
+    Cookies for a domain, see Session.cookies.
+
+    :param domain: the domain.
+    :param name: optional cookie name.
+    :param session: None for the default session, a session name or a Session instance.
+    :return: list of Morsels, a Morsel, or None.
+    """
+    return run(_call(session, 'cookies', domain, name))
+
+
+def filter_cookies(request_url: str, session=None):
+    """
+    Cookies sent with a request to a url, see Session.filter_cookies.
+
+    :param request_url: the url.
+    :param session: None for the default session, a session name or a Session instance.
+    """
+    return run(_call(session, 'filter_cookies', request_url))
+
+
+def delete_all_cookies(session=None) -> None:
+    """ Delete all cookies of a session. """
+    run(_call(session, 'delete_all_cookies'))
+
+
+def delete_cookies_by_domain(domain: str, session=None) -> None:
+    """ Delete the cookies of a domain. """
+    run(_call(session, 'delete_cookies_by_domain', domain))
+
+
+def delete_cookie_by_name(domain: str, name: str, session=None) -> None:
+    """ Delete a cookie of a domain by name. """
+    run(_call(session, 'delete_cookie_by_name', domain, name))
+
+
+def save_cookies(path: str, session=None) -> None:
+    """ Save the cookies of a session to a file. """
+    run(_call(session, 'save_cookies', path))
+
+
+def load_cookies(path: str, session=None) -> None:
+    """ Load cookies from a file in to a session. """
+    run(_call(session, 'load_cookies', path))
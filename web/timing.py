@@ -0,0 +1,299 @@
+# -*- coding: utf-8 -*-
+
+"""
+The MIT License (MIT)
+
+Copyright (c) 2024 Nortxort
+
+Permission is hereby granted, free of charge, to any person obtaining a
+copy of this software and associated documentation files (the "Software"),
+to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense,
+and/or sell copies of the Software, and to permit persons to whom the
+Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+DEALINGS IN THE SOFTWARE.
+"""
+
+import bisect
+import logging
+import time
+from types import SimpleNamespace
+
+import aiohttp
+
+
+log = logging.getLogger(__name__)
+
+PHASES = ('queued', 'dns', 'connect', 'ttfb', 'body', 'total')
+
+# bucket upper bounds in milliseconds
+BOUNDS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 10000, 30000)
+
+
+class Histogram:
+    """
+    Latency histogram with fixed millisecond buckets.
+    """
+    __slots__ = ('counts', 'count', 'sum', 'min', 'max')
+
+    def __init__(self):
+        self.counts = [0] * (len(BOUNDS) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.min = None
+        self.max = None
+
+    def add(self, ms: float) -> None:
+        self.counts[bisect.bisect_left(BOUNDS, ms)] += 1
+        self.count += 1
+        self.sum += ms
+        self.min = ms if self.min is None else min(self.min, ms)
+        self.max = ms if self.max is None else max(self.max, ms)
+
+    def percentile(self, p: float) -> float:
+        """
+        Estimate a percentile as the upper bound of its bucket.
+
+        :param p: percentile, 0 - 100.
+        :return: milliseconds, None if empty.
+        """
+        if not self.count:
+            return None
+        rank = p / 100 * self.count
+        seen = 0
+        for i, n in enumerate(self.counts):
+            seen += n
+            if n and seen >= rank:
+                return min(BOUNDS[i], self.max) if i < len(BOUNDS) else self.max
+        return self.max
+
+    def snapshot(self) -> dict:
+        return {
+            'count': self.count,
+            'mean': self.sum / self.count if self.count else None,
+            'min': self.min,
+            'max': self.max,
+            'p50': self.percentile(50),
+            'p90': self.percentile(90),
+            'p99': self.percentile(99),
+            'buckets': {(str(b) if i < len(BOUNDS) else 'inf'): n
+                        for i, (b, n) in enumerate(zip(BOUNDS + (None,), self.counts)) if n}
+        }
+
+
+class RequestTiming:
+    """
+    Phase timings of a single request, in milliseconds.
+
+    connect covers TCP and TLS setup, aiohttp has no separate TLS hook.
+    """
+    __slots__ = ('method', 'url', 'host', 'status', 'reused', 'error',
+                 'queued', 'dns', 'connect', 'ttfb', 'body', 'total')
+
+    def __init__(self, method: str, url: str, host: str):
+        self.method = method
+        self.url = url
+        self.host = host
+        self.status = None
+        self.reused = False
+        self.error = None
+        self.queued = None
+        self.dns = None
+        self.connect = None
+        self.ttfb = None
+        self.body = None
+        self.total = None
+
+    def __repr__(self):
+        return f'<RequestTiming {self.method} {self.url} total={self.total}>'
+
+    def as_dict(self) -> dict:
+        return {name: getattr(self, name) for name in self.__slots__}
+
+
+class Exporter:
+    """
+    Receives every finished RequestTiming, subclass and implement export.
+    """
+    def export(self, timing: RequestTiming) -> None:
+        raise NotImplementedError
+
+
+class LogExporter(Exporter):
+    """
+    Log every request timing.
+    """
+    def __init__(self, level: int = logging.DEBUG):
+        self.level = level
+
+    def export(self, timing: RequestTiming) -> None:
+        if log.isEnabledFor(self.level):
+            phases = ' '.join(f'{name}={getattr(timing, name):.1f}ms' for name in PHASES
+                              if getattr(timing, name) is not None)
+            log.log(self.level, f'{timing.method} {timing.url} {timing.status} '
+                                f'reused={timing.reused} {phases}')
+
+
+class _HostStats:
+    __slots__ = ('requests', 'reused', 'errors', 'phases')
+
+    def __init__(self):
+        self.requests = 0
+        self.reused = 0
+        self.errors = 0
+        self.phases = {name: Histogram() for name in PHASES}
+
+
+class Timings:
+    """
+    Per host request timings, collected with aiohttp trace hooks.
+
+    Sessions created while Timings.default is set, or created with
+    a Timings, record the queue wait, DNS, connect, time to first
+    byte, body transfer and total time of every request, and
+    whether a pooled connection was reused.
+    """
+    default = None
+
+    def __init__(self, exporters: list = None):
+        """
+        :param exporters: Exporter objects receiving every finished request.
+        """
+        self.exporters = list(exporters or [])
+        self._hosts = {}
+
+    def add_exporter(self, exporter: Exporter) -> None:
+        self.exporters.append(exporter)
+
+    def trace_config(self) -> aiohttp.TraceConfig:
+        """
+        A TraceConfig recording in to this object.
+
+        :return: aiohttp.TraceConfig
+        """
+        config = aiohttp.TraceConfig(trace_config_ctx_factory=SimpleNamespace)
+        config.on_request_start.append(self._on_request_start)
+        config.on_connection_queued_start.append(self._on_mark)
+        config.on_connection_queued_end.append(self._on_queued_end)
+        config.on_connection_create_start.append(self._on_create_start)
+        config.on_connection_create_end.append(self._on_create_end)
+        config.on_connection_reuseconn.append(self._on_reuseconn)
+        config.on_dns_resolvehost_start.append(self._on_mark)
+        config.on_dns_resolvehost_end.append(self._on_dns_end)
+        config.on_request_headers_sent.append(self._on_headers_sent)
+        config.on_request_end.append(self._on_request_end)
+        config.on_request_exception.append(self._on_request_exception)
+        return config
+
+    @staticmethod
+    def _elapsed(since: float) -> float:
+        return (time.perf_counter() - since) * 1000
+
+    async def _on_request_start(self, session, ctx, params) -> None:
+        ctx.start = time.perf_counter()
+        ctx.timing = RequestTiming(params.method, str(params.url), params.url.host)
+
+    async def _on_mark(self, session, ctx, params) -> None:
+        ctx.mark = time.perf_counter()
+
+    async def _on_queued_end(self, session, ctx, params) -> None:
+        ctx.timing.queued = self._elapsed(ctx.mark)
+
+    async def _on_create_start(self, session, ctx, params) -> None:
+        ctx.create = time.perf_counter()
+
+    async def _on_create_end(self, session, ctx, params) -> None:
+        # connection creation includes name resolution
+        ctx.timing.connect = self._elapsed(ctx.create) - (ctx.timing.dns or 0.0)
+
+    async def _on_reuseconn(self, session, ctx, params) -> None:
+        ctx.timing.reused = True
+
+    async def _on_dns_end(self, session, ctx, params) -> None:
+        ctx.timing.dns = self._elapsed(ctx.mark)
+
+    async def _on_headers_sent(self, session, ctx, params) -> None:
+        ctx.sent = time.perf_counter()
+
+    async def _on_request_end(self, session, ctx, params) -> None:
+        timing = ctx.timing
+        timing.status = params.response.status
+        timing.ttfb = self._elapsed(getattr(ctx, 'sent', ctx.start))
+        headers = time.perf_counter()
+
+        def finish():
+            if timing.total is not None:
+                return
+            timing.body = self._elapsed(headers)
+            timing.total = self._elapsed(ctx.start)
+            self.record(timing)
+
+        # the body is complete once the payload reaches eof, a response
+        # released or closed before that ends with its connection
+        response = params.response
+        response.content.on_eof(finish)
+        if response.connection is not None:
+            response.connection.add_callback(finish)
+
+    async def _on_request_exception(self, session, ctx, params) -> None:
+        timing = ctx.timing
+        timing.error = type(params.exception).__name__
+        timing.total = self._elapsed(ctx.start)
+        self.record(timing)
+
+    def record(self, timing: RequestTiming) -> None:
+        """
+        Add a finished request to the histograms and exporters.
+
+        :param timing: RequestTiming object.
+        """
+        stats = self._hosts.get(timing.host)
+        if stats is None:
+            stats = self._hosts[timing.host] = _HostStats()
+
+        stats.requests += 1
+        stats.reused += timing.reused
+        stats.errors += timing.error is not None
+        for name in PHASES:
+            value = getattr(timing, name)
+            if value is not None:
+                stats.phases[name].add(value)
+
+        for exporter in self.exporters:
+            try:
+                exporter.export(timing)
+            except Exception as e:
+                log.error(f'timing exporter {exporter!r} failed: {e}')
+
+    def hosts(self) -> list:
+        return list(self._hosts)
+
+    def snapshot(self) -> dict:
+        """
+        The collected timings as plain dicts.
+
+        :return: dict of host to requests, reused and errors counts and per phase histograms.
+        """
+        return {
+            host: {
+                'requests': stats.requests,
+                'reused': stats.reused,
+                'errors': stats.errors,
+                'phases': {name: hist.snapshot() for name, hist in stats.phases.items() if hist.count}
+            }
+            for host, stats in self._hosts.items()
+        }
+
+    def reset(self) -> None:
+        """ Drop all collected timings. """
+        self._hosts.clear()
@@ -0,0 +1,156 @@
+# -*- coding: utf-8 -*-
+
+"""
+The MIT License (MIT)
+
+Copyright (c) 2024 Nortxort
+
+Permission is hereby granted, free of charge, to any person obtaining a
+copy of this software and associated documentation files (the "Software"),
+to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense,
+and/or sell copies of the Software, and to permit persons to whom the
+Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+DEALINGS IN THE SOFTWARE.
+"""
+
+import logging
+import mimetypes
+import os
+
+import aiohttp
+
+from .http import default_headers, request
+
+
+log = logging.getLogger(__name__)
+
+
+class _Progress:
+    """
+    Progress of a upload spanning one or more files.
+    """
+    def __init__(self, total: int, callback=None):
+        self.total = total
+        self.sent = 0
+        self.callback = callback
+
+    def update(self, size: int) -> None:
+        self.sent += size
+        if self.callback is not None:
+            self.callback(self.sent, self.total)
+
+
+async def file_sender(path: str, chunk_size: int = 64 * 1024, progress=None):
+    """
+    Stream a file from disk in chunks.
+
+    The generator can be passed as data to post, put and patch, which
+    sends it with chunked transfer encoding unless a Content-Length
+    header is given.
+
+    :param path: path of the file to send.
+    :param chunk_size: amount of bytes to read at once.
+    :param progress: callable called with the bytes sent and the file size.
+    :return: async iterator of chunks.
+    """
+    if not isinstance(progress, _Progress):
+        progress = _Progress(os.path.getsize(path), progress)
+
+    import aiofile
+    async with aiofile.async_open(path, 'rb') as f:
+        async for chunk in f.iter_chunked(chunk_size):
+            yield chunk
+            progress.update(len(chunk))
+
+
+def _file_part(value) -> tuple:
+    """ Normalize a files entry to (filename, path, content type). """
+    if isinstance(value, (tuple, list)):
+        filename, path = value[0], value[1]
+        content_type = value[2] if len(value) > 2 else None
+    else:
+        filename, path, content_type = os.path.basename(value), value, None
+
+    if content_type is None:
+        content_type = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+
+    return filename, path, content_type
+
+
+def multipart(files: dict, fields: dict = None, chunk_size: int = 64 * 1024,
+              progress=None) -> aiohttp.MultipartWriter:
+    """
+    Build a multipart/form-data body streaming files from disk.
+
+    :param files: dictionary of field name: path, or (filename, path[, content type]).
+    :param fields: dictionary of field name: value for plain form fields.
+    :param chunk_size: amount of bytes to read from the files at once.
+    :param progress: callable called with the bytes sent and the total file size.
+    :return: aiohttp.MultipartWriter to pass as data.
+    """
+    parts = {name: _file_part(value) for name, value in files.items()}
+    tracker = _Progress(sum(os.path.getsize(p) for _, p, _ in parts.values()), progress)
+
+    writer = aiohttp.MultipartWriter('form-data')
+    for name, value in (fields or {}).items():
+        part = writer.append(str(value))
+        part.set_content_disposition('form-data', name=name)
+
+    for name, (filename, path, content_type) in parts.items():
+        payload = aiohttp.payload.AsyncIterablePayload(
+            file_sender(path, chunk_size, tracker), content_type=content_type)
+        payload.set_content_disposition('form-data', name=name, filename=filename)
+        writer.append_payload(payload)
+
+    return writer
+
+
+async def upload(url: str, path: str = None, files: dict = None, fields: dict = None,
+                 method: str = 'POST', chunked: bool = False, chunk_size: int = 64 * 1024,
+                 progress=None, **kwargs):
+    """
+    Upload files streamed from disk.
+
+    With path the file is sent as the raw request body, with files
+    (and optional fields) as a multipart/form-data body. Memory use is
+    bound by chunk_size, regardless of the file sizes.
+
+    :param url: url of the resource.
+    :param path: path of a file to send as the request body.
+    :param files: dictionary of field name: path, or (filename, path[, content type]).
+    :param fields: dictionary of field name: value for plain form fields.
+    :param method: request method, e.g. POST, PUT or PATCH.
+    :param chunked: send a raw body with chunked transfer encoding instead of a Content-Length.
+    :param chunk_size: amount of bytes to read from the files at once.
+    :param progress: callable called with the bytes sent and the total size.
+    :return: aiohttp.ClientResponse or None.
+    :rtype: aiohttp.ClientResponse | None
+    """
+    if (path is None) == (files is None):
+        raise ValueError('either path or files is required')
+
+    headers = dict(default_headers(kwargs.pop('headers', None), kwargs.pop('rua', False), url))
+
+    if path is not None:
+        size = os.path.getsize(path)
+        data = file_sender(path, chunk_size, _Progress(size, progress))
+        headers.setdefault('Content-Type', mimetypes.guess_type(path)[0] or 'application/octet-stream')
+        if not chunked:
+            headers['Content-Length'] = str(size)
+    else:
+        # part sizes are unknown to aiohttp, multipart bodies are always chunked
+        data = multipart(files, fields, chunk_size, progress)
+
+    log.debug(f'uploading to {url}, path: {path}, files: {files}')
+    return await request(method, url=url, data=data, headers=headers, **kwargs)
@@ -0,0 +1,346 @@
+# -*- coding: utf-8 -*-
+
+"""
+The MIT License (MIT)
+
+Copyright (c) 2024 Nortxort
+
+Permission is hereby granted, free of charge, to any person obtaining a
+copy of this software and associated documentation files (the "Software"),
+to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense,
+and/or sell copies of the Software, and to permit persons to whom the
+Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+DEALINGS IN THE SOFTWARE.
+"""
+
+import asyncio
+import logging
+import random
+import time
+
+import aiohttp
+
+from .http import websocket
+
+
+log = logging.getLogger(__name__)
+
+
+class WebSocketClient:
+    """
+    Managed websocket connection.
+
+    Outgoing and incoming messages pass through bounded queues, a full
+    send queue blocks send(), and a full receive queue stops reading
+    from the socket. Small outgoing messages can be batched, and the
+    connection is re-established with backoff when it drops.
+
+    The client sends its own heartbeat pings and answers those of the
+    server, so the round trip time of each ping is kept in stats['rtt'].
+    stats['queue_latency'] is the time messages wait in the send queue.
+    """
+    def __init__(self, url: str, send_queue: int = 1000, receive_queue: int = 1000,
+                 batch_size: int = 1, batch_delay: float = 0.0, batch_join=None,
+                 heartbeat: float = 30.0, reconnect: bool = True, backoff: float = 0.5,
+                 max_backoff: float = 30.0, on_connect=None, on_disconnect=None, **kwargs):
+        """
+        Initialize the client.
+
+        :param url: url of the websocket.
+        :param send_queue: maximum amount of messages waiting to be sent.
+        :param receive_queue: maximum amount of received messages waiting to be read.
+        :param batch_size: maximum amount of queued messages sent in one go.
+        :param batch_delay: seconds to wait for a batch to fill.
+        :param batch_join: callable joining a list of messages in to a single frame,
+        if not given the messages of a batch are sent back to back.
+        :param heartbeat: seconds between pings, a ping not answered before the
+        next one drops the connection, None to disable.
+        :param reconnect: reconnect when the connection drops.
+        :param backoff: base reconnect delay in seconds.
+        :param max_backoff: maximum reconnect delay in seconds.
+        :param on_connect: coroutine function called with the
+        aiohttp.ClientWebSocketResponse after each (re)connect, before queued
+        messages are sent, e.g. to resubscribe.
+        :param on_disconnect: callable called with the client when a established
+        connection drops.
+        :param kwargs: keywords for web.websocket
+        """
+        self.url = url
+        self.batch_size = max(1, batch_size)
+        self.batch_delay = batch_delay
+        self.batch_join = batch_join
+        self.reconnect = reconnect
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.on_connect = on_connect
+        self.on_disconnect = on_disconnect
+        self.heartbeat = heartbeat
+        # pings and pongs are handled by the reader, to time the pongs
+        self.kwargs = dict(kwargs, autoping=False)
+
+        self.ws = None
+        self.connected = asyncio.Event()
+        self.stats = {
+            'sent': 0,
+            'received': 0,
+            'frames': 0,
+            'reconnects': 0,
+            'queue_latency': 0.0,
+            'rtt': None
+        }
+
+        self._send_queue = asyncio.Queue(send_queue)
+        self._receive_queue = asyncio.Queue(receive_queue)
+        self._unsent = []
+        self._ping = None
+        self._task = None
+        self._closing = False
+
+    def __repr__(self):
+        return f'<WebSocketClient url={self.url!r} connected={self.connected.is_set()}>'
+
+    @property
+    def send_queue_depth(self) -> int:
+        return self._send_queue.qsize()
+
+    @property
+    def receive_queue_depth(self) -> int:
+        return self._receive_queue.qsize()
+
+    @property
+    def closed(self) -> bool:
+        return self._closing
+
+    def snapshot(self) -> dict:
+        """ The client stats including the current queue depths. """
+        return dict(self.stats, send_queue=self.send_queue_depth,
+                    receive_queue=self.receive_queue_depth,
+                    connected=self.connected.is_set())
+
+    async def connect(self, timeout: float = None) -> bool:
+        """
+        Start the connection.
+
+        :param timeout: seconds to wait for the first connection, None to wait forever.
+        :return: True if connected, False on timeout or when the client gave up,
+        e.g. a failed connect without reconnect.
+        """
+        if self._task is None:
+            self._closing = False
+            self._task = asyncio.ensure_future(self._run())
+        if self.connected.is_set():
+            return True
+
+        waiter = asyncio.ensure_future(self.connected.wait())
+        try:
+            await asyncio.wait([waiter, self._task], timeout=timeout,
+                               return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            waiter.cancel()
+        return self.connected.is_set()
+
+    async def close(self) -> None:
+        """ Close the connection and stop reconnecting. """
+        self._closing = True
+        if self.ws is not None:
+            await self.ws.close()
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        self.connected.clear()
+        # end any iteration
+        try:
+            self._receive_queue.put_nowait(None)
+        except asyncio.QueueFull:
+            pass
+
+    async def __aenter__(self):
+        await self.connect()
+        return self
+
+    async def __aexit__(self, *args):
+        await self.close()
+
+    async def send(self, data) -> None:
+        """
+        Queue a message, waiting while the send queue is full.
+
+        :param data: str, bytes, or a object to send as JSON.
+        """
+        await self._send_queue.put((time.monotonic(), data))
+
+    async def receive(self):
+        """
+        The next received message.
+
+        :return: aiohttp.WSMessage, or None once the client is closed.
+        """
+        if self._closing and self._receive_queue.empty():
+            return None
+        return await self._receive_queue.get()
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        msg = await self.receive()
+        if msg is None:
+            raise StopAsyncIteration
+        return msg
+
+    async def _run(self) -> None:
+        attempt = 0
+        while not self._closing:
+            self.ws = await websocket(self.url, **self.kwargs)
+
+            if self.ws is not None:
+                attempt = 0
+                try:
+                    if self.on_connect is not None:
+                        await self.on_connect(self.ws)
+                    self.connected.set()
+                    await self._serve(self.ws)
+                except (aiohttp.ClientError, ConnectionError) as e:
+                    log.error(f'websocket error {self.url}: {e}')
+                finally:
+                    was_connected = self.connected.is_set()
+                    self.connected.clear()
+                    await self.ws.close()
+                    if was_connected and self.on_disconnect is not None and not self._closing:
+                        self.on_disconnect(self)
+
+            if self._closing or not self.reconnect:
+                break
+
+            delay = random.uniform(0, min(self.max_backoff, self.backoff * 2 ** attempt))
+            attempt += 1
+            self.stats['reconnects'] += 1
+            log.debug(f'reconnecting to {self.url} in {delay:.2f}s')
+            await asyncio.sleep(delay)
+
+        if not self._closing:
+            self._closing = True
+            try:
+                self._receive_queue.put_nowait(None)
+            except asyncio.QueueFull:
+                pass
+
+    async def _serve(self, ws) -> None:
+        """ Run the reader and writer until the connection closes. """
+        tasks = [asyncio.ensure_future(self._reader(ws)), asyncio.ensure_future(self._writer(ws))]
+        if self.heartbeat:
+            tasks.append(asyncio.ensure_future(self._pinger(ws)))
+        try:
+            done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                task.result()
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def _pinger(self, ws) -> None:
+        """ Send a ping carrying its send time every heartbeat seconds. """
+        self._ping = None
+        while True:
+            self._ping = str(time.monotonic()).encode()
+            await ws.ping(self._ping)
+            await asyncio.sleep(self.heartbeat)
+            if self._ping is not None:
+                raise ConnectionError(f'no pong from {self.url} within {self.heartbeat}s')
+
+    def _pong(self, data: bytes) -> None:
+        """ Time the answer to the last ping. """
+        if data != self._ping:
+            return
+        self._ping = None
+        rtt = time.monotonic() - float(data)
+        rtt_avg = self.stats['rtt']
+        # moving average of the ping round trip time
+        self.stats['rtt'] = rtt if rtt_avg is None else rtt_avg + (rtt - rtt_avg) * 0.1
+
+    async def _reader(self, ws) -> None:
+        while True:
+            msg = await ws.receive()
+            if msg.type in (aiohttp.WSMsgType.CLOSE, aiohttp.WSMsgType.CLOSING,
+                            aiohttp.WSMsgType.CLOSED, aiohttp.WSMsgType.ERROR):
+                log.debug(f'websocket {self.url} closed: {msg.type}')
+                return
+            if msg.type == aiohttp.WSMsgType.PING:
+                await ws.pong(msg.data)
+                continue
+            if msg.type == aiohttp.WSMsgType.PONG:
+                self._pong(msg.data)
+                continue
+            self.stats['received'] += 1
+            # blocks reading from the socket while the queue is full
+            await self._receive_queue.put(msg)
+
+    async def _batch(self) -> list:
+        """ Collect the next batch of queued messages. """
+        if self._unsent:
+            batch, self._unsent = self._unsent, []
+            return batch
+
+        batch = [await self._send_queue.get()]
+        deadline = time.monotonic() + self.batch_delay
+        while len(batch) < self.batch_size:
+            if not self._send_queue.empty():
+                batch.append(self._send_queue.get_nowait())
+                continue
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._send_queue.get(), remaining))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _send_frame(self, ws, data) -> None:
+        if isinstance(data, str):
+            await ws.send_str(data)
+        elif isinstance(data, (bytes, bytearray, memoryview)):
+            await ws.send_bytes(bytes(data))
+        else:
+            await ws.send_json(data)
+        self.stats['frames'] += 1
+
+    async def _writer(self, ws) -> None:
+        while True:
+            batch = await self._batch()
+            try:
+                if self.batch_join is not None and len(batch) > 1:
+                    await self._send_frame(ws, self.batch_join([data for _, data in batch]))
+                else:
+                    for i, (_, data) in enumerate(batch):
+                        try:
+                            await self._send_frame(ws, data)
+                        except BaseException:
+                            batch = batch[i:]
+                            raise
+            except BaseException:
+                # resend after reconnecting
+                self._unsent = batch
+                raise
+
+            now = time.monotonic()
+            for queued, _ in batch:
+                # moving average of the time spent in the send queue
+                self.stats['queue_latency'] += ((now - queued) - self.stats['queue_latency']) * 0.1
+            self.stats['sent'] += len(batch)
@@ -0,0 +1,277 @@
+# -*- coding: utf-8 -*-
+
+"""
+The MIT License (MIT)
+
+Copyright (c) 2024 Nortxort
+
+Permission is hereby granted, free of charge, to any person obtaining a
+copy of this software and associated documentation files (the "Software"),
+to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense,
+and/or sell copies of the Software, and to permit persons to whom the
+Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+DEALINGS IN THE SOFTWARE.
+"""
+
+import asyncio
+import logging
+
+from .wsclient import WebSocketClient
+
+
+log = logging.getLogger(__name__)
+
+
+class WebSocketPool:
+    """
+    Spread many subscriptions over a few websocket connections.
+
+    Connections are opened as subscriptions need them, up to
+    connections, each holding at most per_connection subscriptions.
+    Messages of all connections are multiplexed in to a single
+    stream, or dispatched to per topic handlers. When a connection
+    drops, its subscriptions move to the remaining connections.
+    """
+    def __init__(self, url: str, subscribe, unsubscribe=None, topic_of=None,
+                 connections: int = 4, per_connection: int = 100,
+                 queue: int = 1000, connect_timeout: float = 10.0, **kwargs):
+        """
+        Initialize the pool.
+
+        :param url: url of the websocket.
+        :param subscribe: callable returning the subscribe message for a topic.
+        :param unsubscribe: callable returning the unsubscribe message for a topic.
+        :param topic_of: callable returning the topic of a received aiohttp.WSMessage,
+        needed for per topic handlers.
+        :param connections: maximum amount of connections.
+        :param per_connection: maximum amount of subscriptions per connection.
+        :param queue: maximum amount of messages waiting in the multiplexed stream.
+        :param connect_timeout: seconds subscribe waits for a connection.
+        :param kwargs: keywords for WebSocketClient
+        """
+        self.url = url
+        self.subscribe_message = subscribe
+        self.unsubscribe_message = unsubscribe
+        self.topic_of = topic_of
+        self.connections = connections
+        self.per_connection = per_connection
+        self.connect_timeout = connect_timeout
+        self.kwargs = kwargs
+
+        self.clients = []
+        self.handlers = {}
+        self._topics = {}
+        self._assigned = {}
+        self._pumps = {}
+        self._queue = asyncio.Queue(queue)
+        self._closed = False
+
+    def __repr__(self):
+        return (f'<WebSocketPool url={self.url!r} connections={len(self.clients)} '
+                f'subscriptions={len(self._topics)}>')
+
+    def snapshot(self) -> dict:
+        """ Pool stats, including the stats of each connection. """
+        return {
+            'subscriptions': len(self._topics),
+            'queue': self._queue.qsize(),
+            'connections': [dict(client.snapshot(), subscriptions=len(self._assigned[client]))
+                            for client in self.clients]
+        }
+
+    def _load(self, client) -> int:
+        return len(self._assigned[client])
+
+    def _client(self, exclude=None):
+        """
+        The least loaded client with room, connected ones first, opening one if needed.
+
+        Clients still connecting count, so concurrent subscribes fill
+        them instead of each opening a connection. Does not await, the
+        caller assigns the topic before any other subscribe runs.
+        """
+        candidates = [c for c in self.clients if c is not exclude and not c.closed
+                      and self._load(c) < self.per_connection]
+        if candidates:
+            return min(candidates, key=lambda c: (not c.connected.is_set(), self._load(c)))
+
+        if len(self.clients) < self.connections:
+            client = WebSocketClient(self.url, on_connect=None,
+                                     on_disconnect=self._dropped, **self.kwargs)
+            client.on_connect = self._resubscriber(client)
+            self.clients.append(client)
+            self._assigned[client] = set()
+            self._pumps[client] = asyncio.ensure_future(self._pump(client))
+            return client
+
+        return None
+
+    def _resubscriber(self, client):
+        async def on_connect(ws):
+            # topics may be assigned while subscribing, repeat until none are left
+            sent = set()
+            while self._assigned[client] - sent:
+                for topic in list(self._assigned[client] - sent):
+                    await client._send_frame(ws, self.subscribe_message(topic))
+                    sent.add(topic)
+        return on_connect
+
+    def _assign(self, topic, client) -> None:
+        old = self._topics.get(topic)
+        if old is not None:
+            self._assigned[old].discard(topic)
+        self._topics[topic] = client
+        self._assigned[client].add(topic)
+
+    async def _subscribe_on(self, client, topic) -> bool:
+        """
+        Subscribe a assigned topic on a client.
+
+        :return: False if the client did not connect in time.
+        """
+        if client.connected.is_set():
+            await client.send(self.subscribe_message(topic))
+            return True
+
+        # on connect all assigned topics are subscribed
+        if await client.connect(self.connect_timeout):
+            return True
+
+        if client.closed and client in self._assigned:
+            # the client gave up, e.g. without reconnect
+            await self._discard(client)
+        return False
+
+    async def _discard(self, client) -> None:
+        """ Remove a client that stopped, its topics are dropped. """
+        for topic in self._assigned.pop(client):
+            if self._topics.get(topic) is client:
+                del self._topics[topic]
+        self.clients.remove(client)
+        self._pumps.pop(client).cancel()
+        await client.close()
+
+    async def subscribe(self, topic, handler=None) -> None:
+        """
+        Subscribe to a topic.
+
+        :param topic: the topic.
+        :param handler: coroutine function called with each message of the topic,
+        without it the messages go to the multiplexed stream.
+        :raises RuntimeError: if every connection holds per_connection topics.
+        :raises ConnectionError: if no connection was made within connect_timeout.
+        """
+        if handler is not None:
+            self.handlers[topic] = handler
+        if topic in self._topics:
+            return
+
+        client = self._client()
+        if client is None:
+            raise RuntimeError(f'pool is full, {self.connections} x {self.per_connection} subscriptions')
+
+        self._assign(topic, client)
+        if not await self._subscribe_on(client, topic):
+            if self._topics.get(topic) is client:
+                del self._topics[topic]
+                self._assigned.get(client, set()).discard(topic)
+            raise ConnectionError(f'could not connect to {self.url}')
+
+    async def unsubscribe(self, topic) -> None:
+        """
+        Unsubscribe from a topic.
+
+        :param topic: the topic.
+        """
+        self.handlers.pop(topic, None)
+        client = self._topics.pop(topic, None)
+        if client is None:
+            return
+
+        self._assigned[client].discard(topic)
+        if self.unsubscribe_message is not None:
+            await client.send(self.unsubscribe_message(topic))
+
+    def _dropped(self, client) -> None:
+        if not self._closed:
+            asyncio.ensure_future(self._rebalance(client))
+
+    async def _rebalance(self, dropped) -> None:
+        """ Move the subscriptions of a dropped connection to connected ones. """
+        moved = 0
+        for topic in list(self._assigned.get(dropped, ())):
+            client = self._client(exclude=dropped)
+            if client is None:
+                break
+            self._assign(topic, client)
+            if not await self._subscribe_on(client, topic):
+                # keep it for the dropped connection to resubscribe when it is back
+                if dropped in self._assigned:
+                    self._assign(topic, dropped)
+                break
+            moved += 1
+
+        log.debug(f'moved {moved} subscriptions from a dropped connection to {self.url}')
+
+    async def _pump(self, client) -> None:
+        """ Forward the messages of a connection. """
+        async for msg in client:
+            topic = self.topic_of(msg) if self.topic_of is not None else None
+            handler = self.handlers.get(topic)
+            if handler is not None:
+                try:
+                    await handler(msg)
+                except Exception as e:
+                    log.error(f'handler for {topic} failed: {e}', exc_info=True)
+            else:
+                await self._queue.put((topic, msg))
+
+    async def receive(self) -> tuple:
+        """
+        The next message without a handler.
+
+        :return: topic and aiohttp.WSMessage, or None once the pool is closed.
+        """
+        if self._closed and self._queue.empty():
+            return None
+        return await self._queue.get()
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        item = await self.receive()
+        if item is None:
+            raise StopAsyncIteration
+        return item
+
+    async def close(self) -> None:
+        """ Close all connections. """
+        self._closed = True
+        await asyncio.gather(*[client.close() for client in self.clients])
+        for pump in self._pumps.values():
+            pump.cancel()
+        await asyncio.gather(*self._pumps.values(), return_exceptions=True)
+        self.clients.clear()
+        self._pumps.clear()
+        try:
+            self._queue.put_nowait(None)
+        except asyncio.QueueFull:
+            pass
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args):
+        await self.close()